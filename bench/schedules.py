@@ -0,0 +1,198 @@
+# Benchmark for Schedules.calculate_schedules.
+# Run from the repo root with `python -m bench.schedules`.
+import contextlib
+import io
+import random
+import time
+from typing import List, Optional
+
+from unique.npc import NPCHandle
+from unique.time import TimeOfDay, schedule_items
+from unique.time.scheduling import Schedule
+from unique.world import World
+from unique.worldmap import ZoneType
+
+SIZES = [50, 500, 5000]
+REPEAT = 5
+
+# for comparing against the old planner: enough friends that everyone who's
+# free usually has a free friend, which the old pairing loop needs
+COMPARE_SIZES = [50, 500]
+COMPARE_SEEDS = range(10)
+COMPARE_FRIENDS_PER_NPC = 20
+
+_FUN = {"HomeFun", "SleepOver", "HostSleepOver"}
+
+
+def _world(
+    n_npcs: int, seed: int, friends_per_npc: int = 5, one_shift_each: bool = False
+) -> World:
+    # like worldgen, minus the levels: needs, jobs and friends. with
+    # one_shift_each, nobody works more than one shift
+    random.seed(seed)
+    w = World()
+    for i in range(n_npcs):
+        npc = w.npcs.generate()
+        w.rhythms.feed(npc, random.randint(5, 10))
+        w.rhythms.sleep(npc, random.randint(5, 10))
+
+    npcs = w.npcs.all()
+    workers = random.sample(npcs, len(npcs))
+    for i in range(max(1, n_npcs // 10)):
+        enterprise = w.enterprises.generate(w, ZoneType.Restaurant)
+        for shift in w.enterprises.all_shifts_of(enterprise):
+            if one_shift_each:
+                w.enterprises.employ(shift, workers.pop())
+            else:
+                w.enterprises.employ(shift, random.choice(npcs))
+
+    w.friendships.mingle(w, friends_per_npc)
+    return w
+
+
+def _old_calculate_schedules(world: World, time_of_day: TimeOfDay) -> Schedule:
+    # what calculate_schedules did before: one pass per rule, asking about each NPC
+    next_schedule = Schedule()
+
+    all_npcs = set(world.npcs.all())
+    no_emergency = set()
+    for npc in all_npcs:
+        if world.rhythms.is_very_sleepy(npc):
+            next_schedule[npc] = schedule_items.HomeSleep
+        else:
+            no_emergency.add(npc)
+
+    not_busy = set()
+    for npc in no_emergency:
+        shifts_now = [
+            shift
+            for shift in world.enterprises.get_shifts_worked_by(npc)
+            if world.enterprises.get_shift(shift).active_at(time_of_day)
+        ]
+        if not shifts_now:
+            not_busy.add(npc)
+            continue
+        go_to = random.choice(shifts_now)
+        next_schedule[npc] = schedule_items.GoToWork(go_to.enterprise)
+
+    up_for_fun = set()
+    for npc in not_busy:
+        if world.rhythms.can_sleep(npc):
+            next_schedule[npc] = schedule_items.HomeSleep
+        else:
+            next_schedule[npc] = schedule_items.HomeFun
+            up_for_fun.add(npc)
+
+    for npc in up_for_fun:
+        some_friends = list(world.friendships.friends(npc))
+        random.shuffle(some_friends)
+        for possible_engagement in some_friends:
+            if possible_engagement in up_for_fun:
+                date = possible_engagement
+                break
+        else:
+            break
+        next_schedule[npc] = schedule_items.SleepOver(date)
+        next_schedule[date] = schedule_items.HostSleepOver
+
+    return next_schedule
+
+
+def _plan(w: World) -> List[str]:
+    # the next schedule for everyone, as text, for comparing runs
+    return ["{} {}".format(npc, w.schedules.next_schedule(npc)) for npc in w.npcs.all()]
+
+
+def _compare_with_old(w: World, time_of_day: TimeOfDay, seed: int) -> Optional[int]:
+    # Outside of sleepovers, the new planner should make the same plan as the
+    # old one for the same seed. That only holds if:
+    #  - nobody has two shifts at once (the old planner drew shifts in set
+    #    order): see one_shift_each
+    #  - the old pairing loop didn't stop early, which it did at the first
+    #    free NPC with no free friends
+    # Returns how many more pairs the new planner made, or None if the old
+    # loop would have stopped early
+    random.seed(seed)
+    old = _old_calculate_schedules(w, time_of_day)
+    random.seed(seed)
+    w.schedules.calculate_schedules(w, time_of_day)
+    new = w.schedules._next_schedule
+
+    npcs = w.npcs.all()
+    fun = {npc for npc in npcs if new[npc].name in _FUN}
+    for npc in fun:
+        if not any(friend in fun for friend in w.friendships.friends(npc)):
+            return None
+
+    for npc in npcs:
+        if npc in fun:
+            assert old[npc].name in _FUN, npc
+        else:
+            assert str(old[npc]) == str(new[npc]), npc
+
+    # the new pairing is maximal: no two free friends are both left out
+    unpaired = {npc for npc in fun if new[npc].name == "HomeFun"}
+    for npc in unpaired:
+        assert not any(f in unpaired for f in w.friendships.friends(npc)), npc
+
+    return _hosts(new, npcs) - _hosts(old, npcs)
+
+
+def _hosts(schedule: Schedule, npcs: List[NPCHandle]) -> int:
+    return sum(1 for npc in npcs if schedule[npc].name == "HostSleepOver")
+
+
+def _time(fn) -> float:
+    best = None
+    for r in range(REPEAT):
+        start = time.perf_counter()
+        for time_of_day in TimeOfDay:
+            fn(time_of_day)
+        elapsed = (time.perf_counter() - start) / len(TimeOfDay)
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    print("{:<8} {:>10} {:>10} {:>10}".format("npcs", "old (ms)", "new (ms)", "pairs"))
+    for n_npcs in SIZES:
+        with contextlib.redirect_stdout(io.StringIO()):
+            w = _world(n_npcs, 0)
+
+        old = _time(lambda tod: _old_calculate_schedules(w, tod))
+        new = _time(lambda tod: w.schedules.calculate_schedules(w, tod))
+
+        # same seed, same plan
+        random.seed(1)
+        w.schedules.calculate_schedules(w, TimeOfDay.Evening)
+        plan = _plan(w)
+        random.seed(1)
+        w.schedules.calculate_schedules(w, TimeOfDay.Evening)
+        assert _plan(w) == plan
+
+        pairs = sum(
+            1
+            for npc in w.npcs.all()
+            if w.schedules.next_schedule(npc).name == "HostSleepOver"
+        )
+        print("{:<8} {:>10.2f} {:>10.2f} {:>10}".format(n_npcs, old, new, pairs))
+
+    print()
+    print("{:<8} {:>10} {:>10}".format("npcs", "compared", "+pairs"))
+    for n_npcs in COMPARE_SIZES:
+        compared = 0
+        more_pairs = 0
+        for seed in COMPARE_SEEDS:
+            with contextlib.redirect_stdout(io.StringIO()):
+                w = _world(n_npcs, seed, COMPARE_FRIENDS_PER_NPC, one_shift_each=True)
+            for time_of_day in TimeOfDay:
+                difference = _compare_with_old(w, time_of_day, seed)
+                if difference is not None:
+                    compared += 1
+                    more_pairs += difference
+        assert compared > 0
+        print("{:<8} {:>10} {:>10}".format(n_npcs, compared, more_pairs))
+
+
+if __name__ == "__main__":
+    main()
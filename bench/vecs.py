@@ -0,0 +1,81 @@
+# Microbenchmark for ds.vecs.
+# Run from the repo root with `python -m bench.vecs` (and `python -O -m bench.vecs`
+# to see the fast mode).
+import timeit
+from typing import NamedTuple
+
+from ds.vecs import R2, V2
+
+N = 200000
+
+
+class _OldV2(NamedTuple):
+    # what V2 did before it had a fast path: validate, then build a new tuple
+    x: int
+    y: int
+
+    @classmethod
+    def new(cls, x: int, y: int) -> "_OldV2":
+        assert isinstance(x, int)
+        assert isinstance(y, int)
+        return _OldV2(x, y)
+
+    def __add__(self, other: "_OldV2") -> "_OldV2":
+        assert isinstance(other, _OldV2)
+        return _OldV2.new(self.x + other.x, self.y + other.y)
+
+    def __mul__(self, other: int) -> "_OldV2":
+        assert isinstance(other, (int, _OldV2))
+        if isinstance(other, int):
+            return _OldV2.new(self.x * other, self.y * other)
+        return _OldV2.new(self.x * other.x, self.y * other.y)
+
+
+def _old_iter(r: R2):
+    for y in range(r.size.y):
+        for x in range(r.size.x):
+            yield _OldV2.new(r.top.x + x, r.top.y + y)
+
+
+def _time(stmt, **names) -> float:
+    return min(timeit.repeat(stmt, globals=names, number=N, repeat=5)) / N * 1e9
+
+
+def main():
+    a, b = V2.new(3, 4), V2.new(10, 20)
+    far_a, far_b = V2.new(3000, 4000), V2.new(1, 2)
+    old_a, old_b = _OldV2.new(3, 4), _OldV2.new(10, 20)
+    rect = V2.new(0, 0).sized(V2.new(40, 30))
+
+    rows = [
+        ("new", _time("V2.new(3, 4)", V2=_OldV2), _time("V2.new(3, 4)", V2=V2)),
+        ("add", _time("a + b", a=old_a, b=old_b), _time("a + b", a=a, b=b)),
+        ("add (not interned)", None, _time("a + b", a=far_a, b=far_b)),
+        ("mul", _time("a * 2", a=old_a), _time("a * 2", a=a)),
+    ]
+    n_cells = rect.size.x * rect.size.y
+    iter_rows = [
+        ("R2 iter", "for v in it(r): pass", dict(it=_old_iter, r=rect)),
+        ("R2 iter", "for v in r: pass", dict(r=rect)),
+        ("R2 iter_xy", "for x, y in r.iter_xy(): pass", dict(r=rect)),
+        ("R2 rows", "for y, xs in r.rows():\n for x in xs: pass", dict(r=rect)),
+    ]
+
+    print("{:<22} {:>10} {:>10}".format("op (ns)", "old", "new"))
+    for name, old, new in rows:
+        print(
+            "{:<22} {:>10} {:>10.1f}".format(
+                name, "-" if old is None else "{:.1f}".format(old), new
+            )
+        )
+
+    print()
+    print("{:<22} {:>10}".format("per cell (ns)", ""))
+    for i, (name, stmt, names) in enumerate(iter_rows):
+        t = min(timeit.repeat(stmt, globals=names, number=200, repeat=5))
+        label = name + (" (old)" if i == 0 else "")
+        print("{:<22} {:>10.1f}".format(label, t / 200 / n_cells * 1e9))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+# Benchmark for worldgen, stage by stage.
+# Run from the repo root with `python -m bench.worldgen`.
+from unique.bigprocs.worldgen import WorldgenParams, generate
+
+SIZES = [50, 1000, 10000]
+
+
+def main():
+    for n_npcs in SIZES:
+        params = WorldgenParams(
+            n_npcs=n_npcs, n_enterprises=max(1, n_npcs // 50), seed=0
+        )
+        w, report = generate(params)
+        print(report.to_text())
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+from functools import lru_cache
+from typing import NamedTuple, Tuple
+
+
+class Layout(NamedTuple):
+    # (first char index, end char index, x, y): a run of chars that go on
+    # consecutive cells of one row. Coordinates are relative to the cursor.
+    runs: Tuple[Tuple[int, int, int, int], ...]
+    end: Tuple[int, int]  # where the cursor winds up, also relative
+
+
+@lru_cache(maxsize=1024)
+def layout(s: str, wrap: bool, left: int, top: int, right: int, bottom: int) -> Layout:
+    # left/top/right/bottom are the bounds, relative to the cursor. (right and
+    # bottom are exclusive) They only matter if we wrap.
+    assert isinstance(s, str)
+    assert isinstance(wrap, bool)
+
+    if wrap:
+        # count the characters until the next break for each word
+        chars_to_next_break = [0 for c in s]
+        last_break = len(s)
+        for i in range(len(s) - 1, -1, -1):  # indices in s in reverse
+            if s[i] in "\r\n ":
+                last_break = i
+            chars_to_next_break[i] = last_break - i
+
+        # count the chars in each word for each word
+        chars_in_word = [0 for c in s]
+        for i, n in enumerate(chars_to_next_break):
+            if chars_to_next_break[i] == 0:
+                chars_in_word[i] = 0
+            else:
+                chars_in_word[i] = max(
+                    0 if i == 0 else chars_in_word[i - 1], chars_to_next_break[i]
+                )
+
+    runs = []
+    x, y = 0, 0
+    just_wrapped = False
+
+    for i, c in enumerate(s):
+        if c == "\r":
+            just_wrapped = False
+            x = 0
+        elif c == "\n" and just_wrapped:
+            continue
+        elif c == "\n":
+            just_wrapped = False
+            x, y = 0, y + 1
+        elif c == " " and just_wrapped:  # collapse one space right after wrapping
+            just_wrapped = False
+            continue
+        else:
+            if wrap and chars_in_word[i] < right and chars_to_next_break[i] > right - x:
+                x, y = 0, y + 1
+
+            # if it's a space and the next word will wrap, wrap now
+            if (
+                wrap
+                and c == " "
+                and i < len(s) - 1
+                and chars_in_word[i + 1] < right
+                and chars_to_next_break[i + 1] > right - x
+            ):
+                x, y = 0, y + 1
+                just_wrapped = True
+                continue
+
+            just_wrapped = False
+            if (
+                runs
+                and runs[-1][1] == i
+                and runs[-1][3] == y
+                and (runs[-1][2] + i - runs[-1][0] == x)
+            ):
+                runs[-1][1] = i + 1
+            else:
+                runs.append([i, i + 1, x, y])
+
+            if wrap:
+                if left <= x + 1 < right and top <= y < bottom:
+                    x += 1
+                elif left <= 0 < right and top <= y + 1 < bottom:
+                    # try a newline
+                    just_wrapped = True
+                    x, y = 0, y + 1
+                else:
+                    x += 1
+            else:
+                # ignore newlines that would be forced
+                x += 1
+
+    return Layout(runs=tuple(tuple(run) for run in runs), end=(x, y))
@@ -1,6 +1,7 @@
 import os.path
 import time
-from typing import Optional, List, Tuple
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
 import pygame
 import pygame.image
@@ -78,6 +79,53 @@ class Font(object):
             screen.fill(self._swatch[bg], dest)
             screen.blit(self._font_images[fg], dest, area=src)
 
+    def render(self, bg: int, fg: int, character: str) -> Optional[pygame.Surface]:
+        # Same as draw(), but onto a standalone tile. None if we have no glyph.
+        v = ord(character)
+        if not 0 <= v < self._n_tiles:
+            return None
+
+        tile = pygame.Surface(list(self._tile_size)).convert()
+        self.draw(tile, V2.zero(), bg, fg, character)
+        return tile
+
+
+class GlyphCache(object):
+    # Fully composited tiles, built on first use and evicted LRU-first once
+    # they take up more than max_bytes.
+    def __init__(self, fonts: Dict[bool, Font], max_bytes: int = 8 * 1024 * 1024):
+        assert isinstance(fonts, dict)
+        assert isinstance(max_bytes, int) and max_bytes > 0
+
+        self._fonts = fonts
+        self._max_bytes = max_bytes
+        self._n_bytes = 0
+        self._tiles = OrderedDict()
+
+    def get(
+        self, character: str, fg: int, bg: int, is_day: bool
+    ) -> Optional[pygame.Surface]:
+        key = (character, fg, bg, is_day)
+        if key in self._tiles:
+            self._tiles.move_to_end(key)
+            return self._tiles[key]
+
+        tile = self._fonts[is_day].render(bg, fg, character)
+        self._tiles[key] = tile
+        self._n_bytes += _tile_bytes(tile)
+
+        while self._n_bytes > self._max_bytes and len(self._tiles) > 1:
+            _, evicted = self._tiles.popitem(last=False)
+            self._n_bytes -= _tile_bytes(evicted)
+
+        return tile
+
+
+def _tile_bytes(tile: Optional[pygame.Surface]) -> int:
+    if tile is None:
+        return 0
+    return tile.get_width() * tile.get_height() * tile.get_bytesize()
+
 
 def start(interactor: Interactor):
     assert isinstance(interactor, Interactor)
@@ -92,6 +140,7 @@ def start(interactor: Interactor):
     )
     font_night = Font.load("vga_8x16.png", Colors.SWATCH_NIGHT, tile_size)
     font_day = Font.load("vga_8x16.png", Colors.SWATCH_DAY, tile_size)
+    glyphs = GlyphCache({False: font_night, True: font_day})
 
     interactor.mark_updated()
     new_is_day = False
@@ -102,21 +151,45 @@ def start(interactor: Interactor):
 
         if changed:
             with screen.lock():
-                for xy in screen.bounds:
-                    new_cell = screen[xy]
-                    old_cell = old_cells.get(xy)
-                    old_cells[xy] = new_cell
-                    if (old_cell, old_is_day) != (new_cell, new_is_day):
-                        # pygame_screen.fill(Colors.SWATCH[Colors.TermBG.color])
-                        (font_day if new_is_day else font_night).draw(
-                            pygame_screen,
-                            xy,
-                            new_cell.bg,
-                            new_cell.fg,
-                            new_cell.character,
+                if old_is_day != new_is_day:
+                    # every cell changes color, so the old cells are no help
+                    old_cells = {}
+                    screen.invalidate()
+
+                blits = []
+                rects = []
+                for span in screen.drain_dirty():
+                    # only redraw the part of the span that really changed
+                    x0, x1 = None, None
+                    for xy in span:
+                        new_cell = screen[xy]
+                        if old_cells.get(xy) == new_cell:
+                            continue
+
+                        old_cells[xy] = new_cell
+                        tile = glyphs.get(
+                            new_cell.character, new_cell.fg, new_cell.bg, new_is_day
+                        )
+                        if tile is not None:
+                            blits.append((tile, xy * tile_size))
+                        if x0 is None:
+                            x0 = xy.x
+                        x1 = xy.x + 1
+
+                    if x0 is not None:
+                        rects.append(
+                            [
+                                x0 * tile_size.x,
+                                span.top.y * tile_size.y,
+                                (x1 - x0) * tile_size.x,
+                                tile_size.y,
+                            ]
                         )
 
-                pygame.display.flip()
+                if blits:
+                    pygame_screen.blits(blits, doreturn=False)
+                if rects:
+                    pygame.display.update(rects)
 
         keys = []
         quit = False
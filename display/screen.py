@@ -1,11 +1,13 @@
 import threading
+from array import array
 from contextlib import contextmanager
-from typing import NamedTuple, Optional, Union
+from typing import List, NamedTuple, Optional, Union
 
 from ds.code_registry import ref, ref_named, ref_unnamed
 from ds.grid import Grid
 from ds.vecs import R2, V2
 
+from .layout import Layout, layout
 from .palette import Color, Colors
 
 
@@ -32,15 +34,24 @@ class Screen(object):
         self._cells: Grid[Cell] = Grid(R2.new(V2.zero(), size), default_cell, is_cell)
         self._cursor = V2.new(0, 0)
 
+        # per row: the span [x0, x1) written since the last drain_dirty()
+        self._dirty_x0 = array("l")
+        self._dirty_x1 = array("l")
+        self.invalidate()
+
     @contextmanager
     def lock(self):
         # TODO: Remove
         yield
 
     def snapshot(self) -> "Screen":
-        screen = Screen(self._cells.bounds.size)
-        for v in self._cells.bounds:
-            screen._cells[v] = self._cells[v]
+        screen = Screen.__new__(Screen)
+        screen.is_day = False
+        screen._cells = self._cells.copy()
+        screen._cursor = self._cursor
+        screen._dirty_x0 = array("l")
+        screen._dirty_x1 = array("l")
+        screen.invalidate()
         return screen
 
     @property
@@ -53,6 +64,40 @@ class Screen(object):
     def __getitem__(self, v2: V2) -> Cell:
         return self._cells[v2]
 
+    def invalidate(self):
+        size = self._cells.bounds.size
+        self._dirty_x0 = array("l", [0]) * size.y
+        self._dirty_x1 = array("l", [size.x]) * size.y
+
+    def drain_dirty(self) -> List[R2]:
+        # one span per row that has been written to since the last call
+        spans = []
+        for y, (x0, x1) in enumerate(zip(self._dirty_x0, self._dirty_x1)):
+            if x0 < x1:
+                spans.append(R2(V2(x0, y), V2(x1 - x0, 1)))
+
+        size = self._cells.bounds.size
+        self._dirty_x0 = array("l", [size.x]) * size.y
+        self._dirty_x1 = array("l", [0]) * size.y
+        return spans
+
+    def _mark_dirty(self, v2: V2):
+        if v2.x < self._dirty_x0[v2.y]:
+            self._dirty_x0[v2.y] = v2.x
+        if v2.x + 1 > self._dirty_x1[v2.y]:
+            self._dirty_x1[v2.y] = v2.x + 1
+
+    def _mark_dirty_region(self, region: R2):
+        if region.is_empty():
+            return
+
+        x0, x1 = region.top.x, region.top.x + region.size.x
+        for y in range(region.top.y, region.top.y + region.size.y):
+            if x0 < self._dirty_x0[y]:
+                self._dirty_x0[y] = x0
+            if x1 > self._dirty_x1[y]:
+                self._dirty_x1[y] = x1
+
 
 @ref
 def default_cell(v2: V2) -> Cell:
@@ -65,15 +110,16 @@ def is_cell(c: Cell):
 
 
 def measure(s: str) -> int:
-    # Rely on the fact that measure() doesn't use the screen if actually_put is false
-    return Drawer(None, None, None, V2.zero(), V2.zero()).measure(s, wrap=False)
+    return _measured(layout(s, False, 0, 0, 0, 0))
 
 
 def measure_wrap(s: str, width: int) -> int:
-    # Rely on the fact that measure() doesn't use the screen if actually_put is false
-    return Drawer(
-        None, V2.zero().to(V2.new(width, 100000)), None, V2.zero(), V2.zero()
-    ).measure(s, wrap=True)
+    return _measured(layout(s, True, 0, 0, width, 100000))
+
+
+def _measured(plan: Layout) -> int:
+    x, y = plan.end
+    return y + (0 if x == 0 else 1)  # if we just wrapped, don't include that too
 
 
 class Drawer(object):
@@ -235,13 +281,41 @@ class Drawer(object):
         self.puts(chr(dw_ix) + chr(dw_ix + 1), wrap=False)
         return self
 
+    def putcells(self, cells: List[Cell]) -> "Drawer":
+        # like puts(wrap=False), but the cells already have their own colors
+        assert self._screen is not None
+
+        visible = self._bounds.intersection(self._actual_bounds)
+        x, y = self._xy
+        self._xy = V2.new(x + len(cells), y)
+        if not visible.top.y <= y < visible.top.y + visible.size.y:
+            return self
+
+        lo = max(0, visible.top.x - x)
+        hi = min(len(cells), visible.top.x + visible.size.x - x)
+        if lo >= hi:
+            return self
+
+        region = R2.new(V2(x + lo, y) + self._offset, V2(hi - lo, 1))
+        x0 = region.top.x - lo
+        self._screen._cells.set_region(region, lambda v: cells[v.x - x0])
+        self._screen._mark_dirty_region(region)
+        return self
+
     def fillc(self, c: str) -> "Drawer":  # TODO: Fill DW?
         assert isinstance(c, str)
         assert len(c) == 1
-        old_xy = self._xy
-        for i in self._bounds:
-            self.goto(i).puts(c, wrap=False)
-        self.goto(old_xy)
+        if c in "\r\n":
+            return self  # puts() would only move the cursor
+
+        region = self._screen_region()
+        self._screen._mark_dirty_region(region)
+        if self._fg is not None and self._bg is not None:
+            self._screen._cells.fill_region(
+                region, Cell.new(bg=self._bg.color, fg=self._fg.color, character=c)
+            )
+        else:
+            self._screen._cells.map_region(region, lambda old: self._putc_of(old, c))
         return self
 
     def measure(self, s: str, wrap: bool = False) -> int:  # TODO: Measure x
@@ -263,96 +337,56 @@ class Drawer(object):
             assert self._screen is not None
 
         start_xy = self._xy
-        new_xy = self._xy
-        just_wrapped = False
-
         if wrap:
-            # count the characters until the next break for each word
-            chars_to_next_break = [0 for c in s]
-            last_break = len(s)
-            for i in range(len(s) - 1, -1, -1):  # indices in s in reverse
-                if s[i] in "\r\n ":
-                    last_break = i
-                chars_to_next_break[i] = last_break - i
-
-            # count the chars in each word for each word
-            chars_in_word = [0 for c in s]
-            for i, n in enumerate(chars_to_next_break):
-                if chars_to_next_break[i] == 0:
-                    chars_in_word[i] = 0
-                else:
-                    chars_in_word[i] = max(
-                        0 if i == 0 else chars_in_word[i - 1], chars_to_next_break[i]
-                    )
-
-        for i, c in enumerate(s):
-            if c == "\r":
-                just_wrapped = False
-                new_xy = V2.new(start_xy.x, new_xy.y)
-            elif c == "\n" and just_wrapped:
-                continue
-            elif c == "\n":
-                just_wrapped = False
-                new_xy = V2.new(start_xy.x, new_xy.y + 1)
-            elif c == " " and just_wrapped:  # collapse one space right after wrapping
-                just_wrapped = False
-                continue
-            else:
-                if (
-                    wrap
-                    and chars_in_word[i] < self.bounds.size.x - start_xy.x
-                    and chars_to_next_break[i] > self.bounds.bot_exclusive.x - new_xy.x
-                ):
-                    new_xy = V2.new(start_xy.x, new_xy.y + 1)
-
-                # if it's a space and the next word will wrap, wrap now
-                if (
-                    wrap
-                    and c == " "
-                    and i < len(s) - 1
-                    and chars_in_word[i + 1] < self.bounds.size.x - start_xy.x
-                    and chars_to_next_break[i + 1]
-                    > self.bounds.bot_exclusive.x - new_xy.x
-                ):
-                    new_xy = V2.new(start_xy.x, new_xy.y + 1)
-                    just_wrapped = True
+            plan = layout(
+                s,
+                wrap,
+                self._bounds.top.x - start_xy.x,
+                self._bounds.top.y - start_xy.y,
+                self._bounds.top.x + self._bounds.size.x - start_xy.x,
+                self._bounds.top.y + self._bounds.size.y - start_xy.y,
+            )
+        else:
+            plan = layout(s, wrap, 0, 0, 0, 0)
+
+        if actually_put:
+            visible = self._bounds.intersection(self._actual_bounds)
+            x0 = visible.top.x
+            x1 = visible.top.x + visible.size.x
+            cells = self._screen._cells
+
+            for i0, i1, dx, dy in plan.runs:
+                y = start_xy.y + dy
+                if not visible.top.y <= y < visible.top.y + visible.size.y:
                     continue
 
-                just_wrapped = False
-                if (
-                    actually_put
-                    and new_xy in self._bounds
-                    and new_xy in self._actual_bounds
-                ):
-                    old_cell = self._screen._cells[new_xy + self._offset]
-                    new_cell = self._putc_of(old_cell, c)
-                    self._screen._cells[new_xy + self._offset] = new_cell
-
-                new_xy_1 = V2.new(new_xy.x + 1, new_xy.y)
-                new_xy_2 = V2.new(start_xy.x, new_xy.y + 1)  # try a newline
-
-                if wrap and self._bounds:
-                    if new_xy_1 in self._bounds:
-                        new_xy = new_xy_1
-                    elif new_xy_2 in self._bounds:
-                        just_wrapped = True
-                        new_xy = new_xy_2
-                    else:
-                        new_xy = new_xy_1
-                else:
-                    # ignore newlines that would be forced
-                    new_xy = new_xy_1
+                # clip the run to the visible columns
+                run_x = start_xy.x + dx
+                i_lo = max(i0, i0 + x0 - run_x)
+                i_hi = min(i1, i0 + x1 - run_x)
+                for i in range(i_lo, i_hi):
+                    xy = V2(run_x + i - i0, y) + self._offset
+                    cells[xy] = self._putc_of(cells[xy], s[i])
+                    self._screen._mark_dirty(xy)
 
+        new_xy = V2.new(start_xy.x + plan.end[0], start_xy.y + plan.end[1])
         if actually_put:
             self._xy = new_xy
 
         return new_xy
 
+    def _screen_region(self) -> R2:
+        # the part of our bounds that puts() could actually write to, in screen space
+        visible = self._bounds.intersection(self._actual_bounds)
+        return R2.new(visible.top + self._offset, visible.size).intersection(
+            self._screen.bounds
+        )
+
     def clear(self) -> "Drawer":
         assert self._screen is not None
-        self._screen._cells.delete_region(
-            (self._bounds.top + self._offset).sized(self._bounds.size)
-        )
+        region = (self._bounds.top + self._offset).sized(self._bounds.size)
+        self._screen._cells.delete_region(region)
+        self._screen._mark_dirty_region(region)
         return self
 
     def _putc_of(self, old: Cell, new_char: str) -> Cell:
@@ -372,10 +406,9 @@ class Drawer(object):
         return self
 
     def fade(self):
-        old_xy = self._xy
-        for i in self._bounds:
-            self.goto(i).fadec()
-        self.goto(old_xy)
+        region = self._screen_region()
+        self._screen._cells.map_region(region, _faded)
+        self._screen._mark_dirty_region(region)
         return self
 
     def fadec(self):
@@ -383,8 +416,13 @@ class Drawer(object):
             return
 
         old = self._screen._cells[self._xy + self._offset]
-        self._screen._cells[self._xy + self._offset] = Cell.new(
-            bg=Colors.FadeBG.color,
-            fg=Colors.FadeFG.color,
-            character=old.character,
-        )
+        self._screen._cells[self._xy + self._offset] = _faded(old)
+        self._screen._mark_dirty(self._xy + self._offset)
+
+
+def _faded(old: Cell) -> Cell:
+    return Cell.new(
+        bg=Colors.FadeBG.color,
+        fg=Colors.FadeFG.color,
+        character=old.character,
+    )
@@ -0,0 +1,58 @@
+from typing import Dict, Iterable, Iterator
+
+from .vecs import V2
+
+
+class Bitmap(object):
+    # A set of V2s, stored as one int per row. Bit i of a row is the tile at
+    # x == self._x0 + i. Whole rows of tiles can be added at once with or_rows.
+
+    def __init__(self):
+        self._x0 = 0
+        self._rows: Dict[int, int] = {}
+
+    def __contains__(self, v: V2) -> bool:
+        assert isinstance(v, V2)
+        if v.x < self._x0:
+            return False
+        return (self._rows.get(v.y, 0) >> (v.x - self._x0)) & 1 == 1
+
+    def __iter__(self) -> Iterator[V2]:
+        # top to bottom, left to right
+        for y in sorted(self._rows):
+            mask = self._rows[y]
+            while mask:
+                low = mask & -mask
+                yield V2.new(self._x0 + low.bit_length() - 1, y)
+                mask ^= low
+
+    def __len__(self) -> int:
+        return sum(bin(mask).count("1") for mask in self._rows.values())
+
+    def add(self, v: V2):
+        assert isinstance(v, V2)
+        self._reach(v.x)
+        self._rows[v.y] = self._rows.get(v.y, 0) | (1 << (v.x - self._x0))
+
+    def update(self, vs: Iterable[V2]):
+        for v in vs:
+            self.add(v)
+
+    def or_rows(self, x0: int, rows: Dict[int, int]):
+        # rows is in the same format as ours, except bit i is x == x0 + i
+        self._reach(x0)
+        shift = x0 - self._x0
+        for y, mask in rows.items():
+            if mask:
+                self._rows[y] = self._rows.get(y, 0) | (mask << shift)
+
+    def _reach(self, x: int):
+        # make sure we can represent tiles as far left as x
+        if x >= self._x0:
+            return
+
+        # rebase everything, leaving some slack so this doesn't happen every time
+        shift = self._x0 - x + 32
+        self._x0 -= shift
+        for y in self._rows:
+            self._rows[y] <<= shift
@@ -1,4 +1,15 @@
-from typing import Callable, Generic, List, Optional, Tuple, TypeVar
+from collections import deque
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
 A = TypeVar("A")
 B = TypeVar("B")
@@ -15,56 +26,60 @@ class GaleShapley(Generic[A, B]):
         self._pref_b_a = pref_b_a
 
     def match(self, lst_a: List[A], lst_b: List[B]) -> List[Tuple[int, int]]:
-        n_as = len(lst_a)
-        n_bs = len(lst_b)
+        # each A's invitations, most preferred first. (Ties: later Bs first)
+        invitelists = []
+        for a in lst_a:
+            prefs = []
+            for b in range(len(lst_b)):
+                pref = self._pref_a_b(a, lst_b[b])
+                if pref is not None:
+                    prefs.append((pref, b))
+            prefs.sort(reverse=True)
+            invitelists.append([b for _, b in prefs])
 
-        a_invitelists = {
-            a: sorted(
-                [
-                    b
-                    for b in range(n_bs)
-                    if self._pref_a_b(lst_a[a], lst_b[b]) is not None
-                ],
-                key=lambda b: self._pref_a_b(lst_a[a], lst_b[b]),
-            )
-            for a in range(n_as)
-        }
+        return self.match_ranked(lst_a, lst_b, invitelists)
 
-        matched_a_s = set()
-        mailboxes_b = {b: None for b in range(n_bs)}
-
-        def invite(new_a, b):
-            old_a = mailboxes_b[b]
-            use_a, discard_a = (
-                (new_a, old_a)
-                if old_a is None
-                else (new_a, old_a)
-                if self._pref_b_a(lst_b[b], lst_a[new_a])
-                > self._pref_b_a(lst_b[b], lst_a[old_a])
-                else (old_a, new_a)
-            )
-            mailboxes_b[b] = use_a
-            return discard_a
+    def match_ranked(
+        self, lst_a: List[A], lst_b: List[B], invitelists: Sequence[Sequence[int]]
+    ) -> List[Tuple[int, int]]:
+        # like match(), but the caller has already worked out each A's
+        # invitations (indexes into lst_b, most preferred first), so pref_a_b
+        # isn't used. (A range() is fine, if an A likes everyone)
+        n_as = len(lst_a)
+        n_bs = len(lst_b)
+        assert len(invitelists) == n_as
 
-        while True:
-            # clear empty lists
-            a_invitelists = {k: v for k, v in a_invitelists.items() if len(v) != 0}
+        # each B's opinion of each A, worked out the first time it matters
+        prefs_b_a: List[Dict[int, int]] = [{} for b in range(n_bs)]
 
-            if len(a_invitelists) == 0:
-                break
+        def pref_b_a(b: int, a: int) -> int:
+            prefs = prefs_b_a[b]
+            pref = prefs.get(a)
+            if pref is None:
+                pref = prefs[a] = self._pref_b_a(lst_b[b], lst_a[a])
+            return pref
 
-            # try for matchings
-            for a in list(a_invitelists):
-                if a in matched_a_s:
-                    continue  # don't look at it
+        next_invite = [0] * n_as
+        mailboxes_b: List[Optional[int]] = [None] * n_bs
 
-                b = a_invitelists[a].pop()
+        # As who don't have a match yet, but still have someone to invite
+        unmatched_as: Deque[int] = deque(range(n_as))
+        while unmatched_as:
+            a = unmatched_as.popleft()
+            invitelist = invitelists[a]
+            if next_invite[a] == len(invitelist):
+                continue  # no one left to invite
 
-                matched_a_s.add(a)
-                matched_a_s.discard(invite(a, b))
+            b = invitelist[next_invite[a]]
+            next_invite[a] += 1
 
-            matchable_as = set(matched_a_s) - set(a_invitelists.keys())
-            if len(matchable_as) == 0:
-                break
+            old_a = mailboxes_b[b]
+            if old_a is None:
+                mailboxes_b[b] = a
+            elif pref_b_a(b, a) > pref_b_a(b, old_a):
+                mailboxes_b[b] = a
+                unmatched_as.append(old_a)
+            else:
+                unmatched_as.append(a)
 
-        return [(a, b) for b, a in mailboxes_b.items() if a is not None]
+        return [(a, b) for b, a in enumerate(mailboxes_b) if a is not None]
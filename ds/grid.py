@@ -1,4 +1,5 @@
-from typing import Callable, Generic, Optional, TypeVar
+from array import array
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
 
 from ds.code_registry import Ref
 
@@ -6,6 +7,12 @@ from .vecs import R2, V2
 
 T = TypeVar("T")
 
+# Cells are kept as indices into a table of interned values, so the grid itself
+# is a flat row-major array of machine ints. Whole rows can then be moved with
+# slice assignment instead of one V2 at a time.
+# (This means T must be hashable.)
+_INDEX_TYPECODE = "L"
+
 
 class Grid(Generic[T]):
     def __init__(
@@ -21,8 +28,15 @@ class Grid(Generic[T]):
         self._default = default
         self._typecheck = typecheck
 
+        # resolve once: these are looked up on every write otherwise
+        self._default_fn = default.resolve()
+        self._typecheck_fn = typecheck.resolve()
+
+        self._values: List[T] = []
+        self._value_ixs: Dict[T, int] = {}
+
         self._bounds = R2.new(V2.zero(), V2.zero())
-        self._grid = [[]]
+        self._cells = array(_INDEX_TYPECODE)
 
         self.resize(bounds)
 
@@ -30,61 +44,156 @@ class Grid(Generic[T]):
     def bounds(self):
         return self._bounds
 
+    def _check_region(self, region: R2):
+        assert isinstance(region, R2)
+        assert region.is_empty() or self._bounds.contains(region)
+
+    def _intern(self, value: T) -> int:
+        ix = self._value_ixs.get(value)
+        if ix is None:
+            # only values we have never seen can fail the typecheck
+            assert self._typecheck_fn(value) is None
+            ix = len(self._values)
+            self._values.append(value)
+            self._value_ixs[value] = ix
+        return ix
+
+    def _row_start(self, x: int, y: int) -> int:
+        return (y - self._bounds.top.y) * self._bounds.size.x + (x - self._bounds.top.x)
+
+    def _default_row(self, x0: int, x1: int, y: int) -> array:
+        default = self._default_fn
+        return array(
+            _INDEX_TYPECODE, [self._intern(default(V2(x, y))) for x in range(x0, x1)]
+        )
+
     def resize(self, bounds: R2):
         assert isinstance(bounds, R2)
 
         old_bounds = self._bounds
-        new_bounds = bounds
-
-        default = self._default.resolve()
-
-        old_grid = self._grid
-        new_grid = [
-            [None for y in range(new_bounds.size.y)] for x in range(new_bounds.size.x)
-        ]
-
-        for xy in new_bounds:
-            x_, y_ = xy - new_bounds.top
-            if xy in old_bounds:
-                new_grid[x_][y_] = old_grid[x_][y_]
-            else:
-                new_grid[x_][y_] = default(xy)
+        old_cells = self._cells
+
+        new_cells = array(_INDEX_TYPECODE)
+        x0, x1 = bounds.top.x, bounds.top.x + bounds.size.x
+        keep_x0 = max(x0, old_bounds.top.x)
+        keep_x1 = min(x1, old_bounds.top.x + old_bounds.size.x)
+
+        for y in range(bounds.top.y, bounds.top.y + bounds.size.y):
+            if (
+                keep_x0 >= keep_x1
+                or not old_bounds.top.y <= y < old_bounds.top.y + old_bounds.size.y
+            ):
+                new_cells.extend(self._default_row(x0, x1, y))
+                continue
+
+            old_start = (y - old_bounds.top.y) * old_bounds.size.x - old_bounds.top.x
+            new_cells.extend(self._default_row(x0, keep_x0, y))
+            new_cells.extend(old_cells[old_start + keep_x0 : old_start + keep_x1])
+            new_cells.extend(self._default_row(keep_x1, x1, y))
 
         self._bounds = bounds
-        self._grid = new_grid
+        self._cells = new_cells
 
     def __delitem__(self, key: V2):
         assert isinstance(key, V2)
         assert key in self._bounds
-        self[key] = self._default.resolve()(key)
+        self[key] = self._default_fn(key)
 
     def __getitem__(self, key: V2):
         assert isinstance(key, V2)
         assert key in self._bounds
-        x, y = key - self._bounds.top
-        return self._grid[x][y]
+        return self._values[self._cells[self._row_start(key.x, key.y)]]
 
     def __setitem__(self, key: V2, value: T):
         assert isinstance(key, V2)
         assert key in self._bounds
-        assert self._typecheck.resolve()(value) is None
-        x, y = key - self._bounds.top
-        self._grid[x][y] = value
+        self._cells[self._row_start(key.x, key.y)] = self._intern(value)
+
+    def copy(self) -> "Grid[T]":
+        return self.get_region(self._bounds)
 
     def delete_region(self, region: R2):
-        for v in region:
-            del self[v]
+        self._check_region(region)
+        w = region.size.x
+        for y in range(region.top.y, region.top.y + region.size.y):
+            start = self._row_start(region.top.x, y)
+            self._cells[start : start + w] = self._default_row(
+                region.top.x, region.top.x + w, y
+            )
+
+    def fill_region(self, region: R2, value: T):
+        self._check_region(region)
+        w = region.size.x
+        row = array(_INDEX_TYPECODE, [self._intern(value)]) * w
+        for y in range(region.top.y, region.top.y + region.size.y):
+            start = self._row_start(region.top.x, y)
+            self._cells[start : start + w] = row
+
+    def map_region(self, region: R2, fn: Callable[[T], T]):
+        # fn is applied once per distinct value in the region, not once per cell
+        self._check_region(region)
+        w = region.size.x
+        mapped: Dict[int, int] = {}
+        values = self._values
+        for y in range(region.top.y, region.top.y + region.size.y):
+            start = self._row_start(region.top.x, y)
+            row = self._cells[start : start + w]
+            for i, ix in enumerate(row):
+                new_ix = mapped.get(ix)
+                if new_ix is None:
+                    new_ix = mapped[ix] = self._intern(fn(values[ix]))
+                row[i] = new_ix
+            self._cells[start : start + w] = row
+
+    def copy_region(self, src: "Grid[T]", region: R2, dest_top: V2):
+        assert isinstance(src, Grid)
+        assert isinstance(dest_top, V2)
+        src._check_region(region)
+        self._check_region(R2.new(dest_top, region.size))
+
+        w = region.size.x
+        if src._values is self._values:
+            remap = None
+        else:
+            remap = [self._intern(v) for v in src._values]
+
+        for dy in range(region.size.y):
+            src_start = src._row_start(region.top.x, region.top.y + dy)
+            row = src._cells[src_start : src_start + w]
+            if remap is not None:
+                row = array(_INDEX_TYPECODE, [remap[ix] for ix in row])
+            dest_start = self._row_start(dest_top.x, dest_top.y + dy)
+            self._cells[dest_start : dest_start + w] = row
 
     def get_region(self, region: R2) -> "Grid[T]":
-        assert self.bounds.contains(region)
-        grid: Grid[T] = Grid(region, self._default, self._typecheck)
-
-        for v in self.bounds:
-            grid[v] = self[v]
+        self._check_region(region)
+        grid: Grid[T] = Grid.__new__(Grid)
+        grid._default = self._default
+        grid._typecheck = self._typecheck
+        grid._default_fn = self._default_fn
+        grid._typecheck_fn = self._typecheck_fn
+        # the interned table only ever grows, so it is safe to share
+        grid._values = self._values
+        grid._value_ixs = self._value_ixs
+        grid._bounds = region
+        grid._cells = array(_INDEX_TYPECODE)
+
+        w = region.size.x
+        for y in range(region.top.y, region.top.y + region.size.y):
+            start = self._row_start(region.top.x, y)
+            grid._cells.extend(self._cells[start : start + w])
 
         return grid
 
     def set_region(self, region: R2, value_fn: Callable[[V2], T]):
-        assert self.bounds.contains(region)
-        for v in self.bounds:
-            self[v] = value_fn(v)
+        self._check_region(region)
+        w = region.size.x
+        for y in range(region.top.y, region.top.y + region.size.y):
+            start = self._row_start(region.top.x, y)
+            self._cells[start : start + w] = array(
+                _INDEX_TYPECODE,
+                [
+                    self._intern(value_fn(V2(x, y)))
+                    for x in range(region.top.x, region.top.x + w)
+                ],
+            )
@@ -6,39 +6,50 @@ B = TypeVar("B")
 
 class ManyToMany(Generic[A, B]):
     def __init__(self):
-        self.a_to_bs: Dict[A, List[B]] = dict()
-        self.b_to_as: Dict[B, List[A]] = dict()
+        # the inner dicts are insertion-ordered sets: the values are always None
+        self.a_to_bs: Dict[A, Dict[B, None]] = dict()
+        self.b_to_as: Dict[B, Dict[A, None]] = dict()
 
     def add(self, a: A, b: B):
         assert a is not None
         assert b is not None
 
-        self.a_to_bs[a] = self.a_to_bs.get(a, [])
-        self.a_to_bs[a].append(b)
-        self.b_to_as[b] = self.b_to_as.get(b, [])
-        self.b_to_as[b].append(a)
+        bs = self.a_to_bs.get(a)
+        if bs is None:
+            bs = self.a_to_bs[a] = {}
+        bs[b] = None
+
+        as_ = self.b_to_as.get(b)
+        if as_ is None:
+            as_ = self.b_to_as[b] = {}
+        as_[a] = None
 
     def remove(self, a: A, b: B):
-        if a in self.a_to_bs and b in self.a_to_bs[a]:
-            self.a_to_bs[a].remove(b)
-            if len(self.a_to_bs[a]) == 0:
-                del self.a_to_bs[a]
+        if not self.has(a, b):
+            return
 
-            self.b_to_as[b].remove(a)
-            if len(self.b_to_as[b]) == 0:
-                del self.b_to_as[b]
+        bs = self.a_to_bs[a]
+        del bs[b]
+        if len(bs) == 0:
+            del self.a_to_bs[a]
+
+        as_ = self.b_to_as[b]
+        del as_[a]
+        if len(as_) == 0:
+            del self.b_to_as[b]
 
     def has(self, a: A, b: B):
-        return b in self.a_to_bs[a]
+        return b in self.a_to_bs.get(a, ())
 
     def remove_a(self, a: A):
         if a not in self.a_to_bs:
             return
         bs = self.a_to_bs.pop(a)
         for b in bs:
-            self.b_to_as[b].remove(a)
+            as_ = self.b_to_as[b]
+            del as_[a]
 
-            if len(self.b_to_as[b]) == 0:
+            if len(as_) == 0:
                 del self.b_to_as[b]
 
     def remove_b(self, b: B):
@@ -46,19 +57,26 @@ class ManyToMany(Generic[A, B]):
             return
         as_ = self.b_to_as.pop(b)
         for a in as_:
-            self.a_to_bs[a].remove(b)
+            bs = self.a_to_bs[a]
+            del bs[b]
 
-            if len(self.a_to_bs[a]) == 0:
+            if len(bs) == 0:
                 del self.a_to_bs[a]
 
     def get_bs(self, a: A) -> Iterator[B]:
-        for b in self.a_to_bs.get(a):
+        for b in self.a_to_bs.get(a, ()):
             yield b
 
     def get_as(self, b: B) -> Iterator[A]:
-        for a in self.b_to_as.get(b):
+        for a in self.b_to_as.get(b, ()):
             yield a
 
+    def count_bs(self, a: A) -> int:
+        return len(self.a_to_bs.get(a, ()))
+
+    def count_as(self, b: B) -> int:
+        return len(self.b_to_as.get(b, ()))
+
     def all(self) -> Iterator[Tuple[A, B]]:
         for a, bs in self.a_to_bs.items():
             for b in bs:
@@ -6,7 +6,8 @@ B = TypeVar("B")
 
 class OneToMany(Generic[A, B]):
     def __init__(self):
-        self.a_to_bs: Dict[A, List[B]] = dict()
+        # the inner dicts are insertion-ordered sets: the values are always None
+        self.a_to_bs: Dict[A, Dict[B, None]] = dict()
         self.b_to_a: Dict[B, A] = dict()
 
     def add(self, a: A, b: B):
@@ -15,20 +16,18 @@ class OneToMany(Generic[A, B]):
 
         old_a = self.get_a(b)
 
-        if old_a:
+        if old_a is not None:
             self.remove(old_a, b)
 
-        self.a_to_bs[a] = self.a_to_bs.get(a, [])
-        self.a_to_bs[a].append(b)
+        bs = self.a_to_bs.get(a)
+        if bs is None:
+            bs = self.a_to_bs[a] = {}
+        bs[b] = None
         self.b_to_a[b] = a
 
     def remove(self, a: A, b: B):
-        if a in self.a_to_bs and b in self.a_to_bs[a]:
-            self.a_to_bs[a].remove(b)
-            if len(self.a_to_bs[a]) == 0:
-                del self.a_to_bs[a]
-
-            del self.b_to_a[b]
+        if self.b_to_a.get(b) == a:
+            self.remove_b(b)
 
     def has(self, a: A, b: B):
         return self.b_to_a.get(b) == a
@@ -44,15 +43,19 @@ class OneToMany(Generic[A, B]):
         if b not in self.b_to_a:
             return
         a = self.b_to_a.pop(b)
-        self.a_to_bs[a].remove(b)
+        bs = self.a_to_bs[a]
+        del bs[b]
 
-        if len(self.a_to_bs[a]) == 0:
+        if len(bs) == 0:
             del self.a_to_bs[a]
 
     def get_bs(self, a: A) -> Iterator[B]:
-        for b in self.a_to_bs.get(a, []):
+        for b in self.a_to_bs.get(a, ()):
             yield b
 
+    def count_bs(self, a: A) -> int:
+        return len(self.a_to_bs.get(a, ()))
+
     def get_a(self, b: B) -> Optional[A]:
         return self.b_to_a.get(b)
 
@@ -1,4 +1,7 @@
-from typing import Iterator, List, NamedTuple, Union
+from typing import Iterator, List, NamedTuple, Tuple, Union
+
+# All the validation in here is done with asserts, so `python -O` is the fast
+# mode: it strips them and leaves only the arithmetic.
 
 
 class V2(NamedTuple):
@@ -10,11 +13,11 @@ class V2(NamedTuple):
         assert isinstance(x, int)
         assert isinstance(y, int)
 
-        return V2(x, y)
+        return _v2(x, y)
 
     @classmethod
     def zero(cls) -> "V2":
-        return V2.new(0, 0)
+        return _ZERO
 
     def is_unsigned(self) -> bool:
         return self.x >= 0 and self.y >= 0
@@ -29,38 +32,63 @@ class V2(NamedTuple):
 
     def __add__(self, other: "V2") -> "V2":
         assert isinstance(other, V2)
-        return V2.new(self.x + other.x, self.y + other.y)
+        return _v2(self[0] + other[0], self[1] + other[1])
 
     def __sub__(self, other: "V2") -> "V2":
         assert isinstance(other, V2)
-        return V2.new(self.x - other.x, self.y - other.y)
+        return _v2(self[0] - other[0], self[1] - other[1])
 
     def __mul__(self, other: Union[int, "V2"]) -> "V2":
-        assert isinstance(other, (int, V2))
-        if isinstance(other, int):
-            return V2.new(self.x * other, self.y * other)
+        if other.__class__ is int:
+            return _v2(self[0] * other, self[1] * other)
+        elif isinstance(other, int):  # (bool and other int subclasses)
+            return _v2(self[0] * other, self[1] * other)
         else:
-            return V2.new(self.x * other.x, self.y * other.y)
+            assert isinstance(other, V2)
+            return _v2(self[0] * other[0], self[1] * other[1])
 
     def __neg__(self) -> "V2":
-        return V2.new(-self.x, -self.y)
+        return _v2(-self[0], -self[1])
 
     def manhattan(self, other: "V2") -> int:
         assert isinstance(other, V2)
         return abs(self.x - other.x) + abs(self.y - other.y)
 
     def ortho_neighbors(self) -> Iterator["V2"]:
-        yield V2.new(self.x - 1, self.y)
-        yield V2.new(self.x, self.y - 1)
-        yield V2.new(self.x + 1, self.y)
-        yield V2.new(self.x, self.y + 1)
+        x, y = self
+        yield _v2(x - 1, y)
+        yield _v2(x, y - 1)
+        yield _v2(x + 1, y)
+        yield _v2(x, y + 1)
 
     def neighbors(self) -> Iterator["V2"]:
         for y in range(self.y - 1, self.y + 2):
             for x in range(self.x - 1, self.x + 2):
                 if x == self.x and y == self.y:
                     continue
-                yield V2.new(x, y)
+                yield _v2(x, y)
+
+
+_new_tuple = tuple.__new__
+
+# Small vectors (screen coordinates, most level coordinates, directions) are
+# made once up front and shared, which is cheaper than building a new tuple.
+_INTERN_MIN = -16
+_INTERN_MAX = 112  # exclusive
+_INTERNED = [
+    [_new_tuple(V2, (x, y)) for y in range(_INTERN_MIN, _INTERN_MAX)]
+    for x in range(_INTERN_MIN, _INTERN_MAX)
+]
+
+
+def _v2(x: int, y: int) -> V2:
+    # V2.new, minus the validation
+    if _INTERN_MIN <= x < _INTERN_MAX and _INTERN_MIN <= y < _INTERN_MAX:
+        return _INTERNED[x - _INTERN_MIN][y - _INTERN_MIN]
+    return _new_tuple(V2, (x, y))
+
+
+_ZERO = _v2(0, 0)
 
 
 class R2(NamedTuple):
@@ -104,20 +132,50 @@ class R2(NamedTuple):
     def expand(self, amt: "V2"):
         return R2.new(self.top - amt, self.size + amt * 2)
 
+    def is_empty(self) -> bool:
+        return self.size.x == 0 or self.size.y == 0
+
+    def intersection(self, other: "R2") -> "R2":
+        assert isinstance(other, R2)
+        x0 = max(self.top.x, other.top.x)
+        y0 = max(self.top.y, other.top.y)
+        x1 = min(self.top.x + self.size.x, other.top.x + other.size.x)
+        y1 = min(self.top.y + self.size.y, other.top.y + other.size.y)
+        return R2.new(V2.new(x0, y0), V2.new(max(x1 - x0, 0), max(y1 - y0, 0)))
+
     def zeroed(self) -> "R2":
         return R2(V2.zero(), self.size)
 
     def __iter__(self) -> Iterator["V2"]:
-        for y in range(self.size.y):
-            for x in range(self.size.x):
-                yield V2.new(self.top.x + x, self.top.y + y)
+        xs = range(self.top.x, self.top.x + self.size.x)
+        for y in range(self.top.y, self.top.y + self.size.y):
+            for x in xs:
+                yield _v2(x, y)
+
+    def iter_xy(self) -> Iterator[Tuple[int, int]]:
+        # same order as __iter__, but plain ints
+        xs = range(self.top.x, self.top.x + self.size.x)
+        for y in range(self.top.y, self.top.y + self.size.y):
+            for x in xs:
+                yield x, y
+
+    def rows(self) -> Iterator[Tuple[int, range]]:
+        # (y, xs) for each row, top to bottom
+        xs = range(self.top.x, self.top.x + self.size.x)
+        for y in range(self.top.y, self.top.y + self.size.y):
+            yield y, xs
 
     def __contains__(self, v: V2):
         assert isinstance(v, V2)
-        return (
-            self.top.x <= v.x < self.top.x + self.size.x
-            and self.top.y <= v.y < self.top.y + self.size.y
-        )
+        x, y = v
+        top_x, top_y = self[0]
+        size_x, size_y = self[1]
+        return top_x <= x < top_x + size_x and top_y <= y < top_y + size_y
+
+    def contains_xy(self, x: int, y: int) -> bool:
+        top_x, top_y = self[0]
+        size_x, size_y = self[1]
+        return top_x <= x < top_x + size_x and top_y <= y < top_y + size_y
 
     def contains(self, other: "R2") -> bool:
         assert isinstance(other, R2)
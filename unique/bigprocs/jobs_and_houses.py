@@ -1,103 +1,152 @@
 import itertools
 import random
-from typing import NamedTuple, Set
+from typing import Dict, List, Optional, Set
 
 from ds.gale_shapley import GaleShapley
 from ds.lists import shuffled
 
 from ..npc import NPCHandle
 from ..social import EnterpriseHandle, HouseholdHandle
+from ..social.enterprises.base import ShiftHandle
 from ..world import World
-
-
-class _Sets(NamedTuple):
-    all_npcs: Set[NPCHandle]
-    all_households: Set[HouseholdHandle]
-    all_enterprises: Set[EnterpriseHandle]
-
-    household_npcs: Set[NPCHandle]
-    job_npcs: Set[NPCHandle]
-
-    resented_npcs: Set[NPCHandle]
-
-    no_household_npcs: Set[NPCHandle]
-    no_job_npcs: Set[NPCHandle]
-
-
-def _tabulate_sets(w: World) -> _Sets:
-    all_npcs = set(w.npcs.all())
-    all_households = set(w.households.all())
-    all_enterprises = set(w.enterprises.all())
-
-    household_npcs = set()
-    for h in all_households:
-        for m in w.households.members(h):
-            household_npcs.add(m)
-
-    job_npcs = set()
-    for e in all_enterprises:
-        for m in w.enterprises.get_employees(e):
-            job_npcs.add(m)
-
-    no_household_npcs = all_npcs - household_npcs
-    no_job_npcs = all_npcs - job_npcs
-
-    resented_npcs = set()
-    for h in all_households:
-        all_members = set(w.households.members(h))
-        job_members = set(m for m in all_members if m in job_npcs)
-        no_job_members = set(m for m in all_members if m in no_job_npcs)
-
+from .stages import Stopwatch
+
+
+class _Sets(object):
+    # Who does and doesn't have a household or a job. Tabulated once, then
+    # kept up to date by making all changes to households and jobs through
+    # here, rather than tabulated from scratch before every step
+    def __init__(self, w: World):
+        self.all_npcs: Set[NPCHandle] = set(w.npcs.all())
+        self.all_households: Set[HouseholdHandle] = set(w.households.all())
+        self.all_enterprises: Set[EnterpriseHandle] = set(w.enterprises.all())
+
+        self.household_npcs: Set[NPCHandle] = set()
+        for h in self.all_households:
+            for m in w.households.members(h):
+                self.household_npcs.add(m)
+
+        self.job_npcs: Set[NPCHandle] = set()
+        for e in self.all_enterprises:
+            for m in w.enterprises.get_employees(e):
+                self.job_npcs.add(m)
+
+        self.no_household_npcs: Set[NPCHandle] = self.all_npcs - self.household_npcs
+        self.no_job_npcs: Set[NPCHandle] = self.all_npcs - self.job_npcs
+
+        # the jobless member of a household where everyone else works
+        self.resented_npcs: Set[NPCHandle] = set()
+        self._resented_in: Dict[HouseholdHandle, NPCHandle] = {}
+        for h in self.all_households:
+            self._update_resented(w, h)
+
+    def create_household(self, w: World, npcs: List[NPCHandle]) -> HouseholdHandle:
+        h = w.households.create(w, npcs)
+        for n in npcs:
+            self._set_household(n, True)
+        self.all_households.add(h)
+        self._update_resented(w, h)
+        return h
+
+    def add_member(self, w: World, h: HouseholdHandle, npc: NPCHandle):
+        old_h = w.households.household_of(npc)
+        w.households.add_member(h, npc)
+        self._set_household(npc, True)
+        self._update_resented(w, h)
+        if old_h is not None and old_h != h:
+            self._update_resented(w, old_h)
+
+    def evict(self, w: World, npc: NPCHandle):
+        old_h = w.households.household_of(npc)
+        w.households.evict(npc)
+        self._set_household(npc, False)
+        if old_h is not None:
+            self._update_resented(w, old_h)
+
+    def employ(self, w: World, shift: ShiftHandle, npc: NPCHandle):
+        old_npc = w.enterprises.get_employee(shift)
+        w.enterprises.employ(shift, npc)
+        for n in [npc] if old_npc is None else [npc, old_npc]:
+            has_job = next(w.enterprises.get_shifts_worked_by(n), None) is not None
+            if has_job == (n in self.job_npcs):
+                continue
+
+            if has_job:
+                self.job_npcs.add(n)
+                self.no_job_npcs.discard(n)
+            else:
+                self.job_npcs.discard(n)
+                self.no_job_npcs.add(n)
+
+            h = w.households.household_of(n)
+            if h is not None:
+                self._update_resented(w, h)
+
+    def _set_household(self, npc: NPCHandle, has_household: bool):
+        if has_household:
+            self.household_npcs.add(npc)
+            self.no_household_npcs.discard(npc)
+        else:
+            self.household_npcs.discard(npc)
+            self.no_household_npcs.add(npc)
+
+    def _update_resented(self, w: World, h: HouseholdHandle):
+        # (call when the household's members change, or their jobs do)
+        old_resented = self._resented_in.pop(h, None)
+        if old_resented is not None:
+            self.resented_npcs.discard(old_resented)
+
+        all_members = list(w.households.members(h))
+        if not all_members:
+            # households with no members don't exist
+            self.all_households.discard(h)
+            return
+
+        job_members = [m for m in all_members if m in self.job_npcs]
+        no_job_members = [m for m in all_members if m in self.no_job_npcs]
         if len(job_members) >= 1 and len(no_job_members) == 1:
-            for m in no_job_members:
-                resented_npcs.add(m)
-
-    return _Sets(
-        all_npcs=all_npcs,
-        all_households=all_households,
-        all_enterprises=all_enterprises,
-        household_npcs=household_npcs,
-        job_npcs=job_npcs,
-        resented_npcs=resented_npcs,
-        no_household_npcs=no_household_npcs,
-        no_job_npcs=no_job_npcs,
-    )
+            self._resented_in[h] = no_job_members[0]
+            self.resented_npcs.add(no_job_members[0])
+
 
+def run(w: World, stopwatch: Optional[Stopwatch] = None):
+    stopwatch = stopwatch or Stopwatch()
+    sets = _Sets(w)
 
-def run(w: World):
-    create_seed_households(w)
+    with stopwatch.stage("seed households"):
+        create_seed_households(w, sets)
 
     for iteration in range(10):
-        recruit_npcs_to_incomplete_households(w)
-        recruit_npcs_to_jobs(w)
-        evict_resented_npcs(w)
-        # TODO: Drop shifts for NPCs that have too many shifts
+        with stopwatch.stage("jobs and houses {}".format(iteration)):
+            recruit_npcs_to_incomplete_households(w, sets)
+            recruit_npcs_to_jobs(w, sets)
+            evict_resented_npcs(w, sets)
+            # TODO: Drop shifts for NPCs that have too many shifts
 
-    create_remaining_households(w)
+    with stopwatch.stage("remaining households"):
+        create_remaining_households(w, sets)
 
 
-def create_seed_households(w: World):
-    sets = _tabulate_sets(w)
+# NOTE: Sets are sorted before being shuffled or walked through in any way that
+# uses the RNG, so that the world only depends on the random seed
 
-    no_household_npcs = shuffled(sets.no_household_npcs)
+
+def create_seed_households(w: World, sets: _Sets):
+    no_household_npcs = shuffled(sorted(sets.no_household_npcs))
     incomplete_npcs = no_household_npcs[
         : len(no_household_npcs) // 3
     ]  # limit number of seed households
 
     for n in incomplete_npcs:
-        w.households.create(w, [n])
-
-
-def create_remaining_households(w: World):
-    sets = _tabulate_sets(w)
+        sets.create_household(w, [n])
 
-    for n in sets.no_household_npcs:
-        w.households.create(w, [n])
 
+def create_remaining_households(w: World, sets: _Sets):
+    for n in sorted(sets.no_household_npcs):
+        sets.create_household(w, [n])
 
-def recruit_npcs_to_incomplete_households(w: World):
-    sets = _tabulate_sets(w)
 
+def recruit_npcs_to_incomplete_households(w: World, sets: _Sets):
     # == Households that want to recruit NPCs ==
     incomplete_households = set()
     incomplete_npcs = set(sets.no_household_npcs)
@@ -117,7 +166,7 @@ def recruit_npcs_to_incomplete_households(w: World):
 
     # TODO: Homeless NPCs should be recruitable to a household, even if they are already in one
     household_npc_preference = {}
-    for h in incomplete_households:
+    for h in sorted(incomplete_households):
         members = shuffled(w.households.members(h))
         invitable_people = []
         for m in members:
@@ -141,18 +190,28 @@ def recruit_npcs_to_incomplete_households(w: World):
         ),
     )
 
-    match_households = shuffled(incomplete_households)
-    match_npcs = shuffled(incomplete_npcs)
-    matches = gale_shapley.match(match_households, match_npcs)
+    match_households = shuffled(sorted(incomplete_households))
+    match_npcs = shuffled(sorted(incomplete_npcs))
+
+    # only invite people the household knows: asking pref_a_b about every NPC
+    # would come to the same thing, but take households * NPCs calls
+    npc_ixs = {npc: i for i, npc in enumerate(match_npcs)}
+    invitelists = [
+        sorted(
+            (npc_ixs[npc] for npc in household_npc_preference[h] if npc in npc_ixs),
+            key=lambda i: (household_npc_preference[h][match_npcs[i]], i),
+            reverse=True,
+        )
+        for h in match_households
+    ]
+    matches = gale_shapley.match_ranked(match_households, match_npcs, invitelists)
     for ix_household, ix_npc in matches:
-        w.households.add_member(match_households[ix_household], match_npcs[ix_npc])
+        sets.add_member(w, match_households[ix_household], match_npcs[ix_npc])
 
 
-def recruit_npcs_to_jobs(w: World):
+def recruit_npcs_to_jobs(w: World, sets: _Sets):
     # TODO: Identify NPCs who need a job
     #  (ex. are homeless, are living above their means, are resented by their household for being idle)
-    sets = _tabulate_sets(w)
-
     incomplete_shifts = set(
         shift
         for shift in w.enterprises.all_shifts()
@@ -166,27 +225,34 @@ def recruit_npcs_to_jobs(w: World):
         if True:  # TODO: No one wants to be idle for now
             incomplete_npcs.add(npc)
 
+    # (no one gets hired until the matching is done)
+    employees = {e: list(w.enterprises.get_employees(e)) for e in sets.all_enterprises}
+
     gale_shapley = GaleShapley(
         lambda shift, npc: 1,  # TODO: Give enterprises a reason to prefer one NPC over another
         lambda npc, shift:  # NPCs like households with more friends
         # TODO: Scale down by n members in household?
         sum(
             1
-            for member in w.enterprises.get_employees(shift.enterprise)
+            for member in employees[shift.enterprise]
             if w.friendships.npc_likes(npc, member)
         ),
     )
 
-    match_shifts = shuffled(incomplete_shifts)
-    match_npcs = shuffled(incomplete_npcs)
-    matches = gale_shapley.match(match_shifts, match_npcs)
+    match_shifts = shuffled(sorted(incomplete_shifts))
+    match_npcs = shuffled(sorted(incomplete_npcs))
 
-    for ix_shift, ix_npc in matches:
-        w.enterprises.employ(match_shifts[ix_shift], match_npcs[ix_npc])
+    # every shift likes every NPC the same, so they all go down the list in
+    # the same order
+    everyone = range(len(match_npcs) - 1, -1, -1)
+    matches = gale_shapley.match_ranked(
+        match_shifts, match_npcs, [everyone] * len(match_shifts)
+    )
 
+    for ix_shift, ix_npc in matches:
+        sets.employ(w, match_shifts[ix_shift], match_npcs[ix_npc])
 
-def evict_resented_npcs(w: World):
-    sets = _tabulate_sets(w)
 
-    for n in sets.resented_npcs:
-        w.households.evict(n)
+def evict_resented_npcs(w: World, sets: _Sets):
+    for n in sorted(sets.resented_npcs):
+        sets.evict(w, n)
@@ -0,0 +1,20 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, NamedTuple
+
+
+class StageTiming(NamedTuple):
+    name: str
+    seconds: float
+
+
+class Stopwatch(object):
+    # times each stage of a big procedure, in the order they ran
+    def __init__(self):
+        self.stages: List[StageTiming] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        self.stages.append(StageTiming(name, time.perf_counter() - start))
@@ -1,27 +1,91 @@
 import random
+from typing import Callable, List, NamedTuple, Optional, Tuple
 
 from ..world import World
 from ..worldmap import ZoneType
 from . import jobs_and_houses
+from .stages import StageTiming, Stopwatch
 
-N_NPCS = 50
-N_ENTERPRISES = 1
 
+class WorldgenParams(NamedTuple):
+    n_npcs: int = 50
+    n_enterprises: int = 1
+    friends_per_npc: int = 5
 
-def main(w: World):
-    for i in range(N_NPCS):
-        npc = w.npcs.generate()
-        w.rhythms.feed(npc, random.randint(5, 10))
-        w.rhythms.sleep(npc, random.randint(5, 10))
+    # None to carry on from wherever the RNG already is
+    seed: Optional[int] = None
 
-    for i in range(N_ENTERPRISES):
-        w.enterprises.generate(
-            w, ZoneType.Restaurant
-        )  # TODO: Generate other enterprises
 
-    print(
-        [w.npcs.get(i).name for i in w.npcs._all.keys()]
-    )  # TODO: Better way to do this for non-debugging in the future
+class WorldgenReport(NamedTuple):
+    params: WorldgenParams
+    stages: List[StageTiming]
 
-    w.friendships.mingle(w, 5)  # every NPC gets 5 friends
-    jobs_and_houses.run(w)
+    n_npcs: int
+    n_households: int
+    n_shifts: int
+    n_filled_shifts: int
+
+    @property
+    def seconds(self) -> float:
+        return sum(stage.seconds for stage in self.stages)
+
+    def to_text(self) -> str:
+        lines = [
+            "{} NPCs, {} households, {}/{} shifts filled".format(
+                self.n_npcs, self.n_households, self.n_filled_shifts, self.n_shifts
+            )
+        ]
+        for stage in self.stages:
+            lines.append("{:<24} {:>8.3f}s".format(stage.name, stage.seconds))
+        lines.append("{:<24} {:>8.3f}s".format("total", self.seconds))
+        return "\n".join(lines)
+
+
+def generate(
+    params: WorldgenParams, new_world: Callable[[], World] = World
+) -> Tuple[World, WorldgenReport]:
+    # the seed goes in before the world exists: its Realtors use the RNG too
+    if params.seed is not None:
+        random.seed(params.seed)
+
+    stopwatch = Stopwatch()
+    with stopwatch.stage("world"):
+        w = new_world()
+
+    main(w, params, stopwatch)
+
+    shifts = list(w.enterprises.all_shifts())
+    report = WorldgenReport(
+        params=params,
+        stages=stopwatch.stages,
+        n_npcs=len(w.npcs.all()),
+        n_households=sum(1 for _ in w.households.all()),
+        n_shifts=len(shifts),
+        n_filled_shifts=sum(
+            1 for shift in shifts if w.enterprises.get_employee(shift) is not None
+        ),
+    )
+    return w, report
+
+
+def main(w: World, params: WorldgenParams, stopwatch: Optional[Stopwatch] = None):
+    stopwatch = stopwatch or Stopwatch()
+
+    with stopwatch.stage("npcs"):
+        npcs = [w.npcs.generate() for i in range(params.n_npcs)]
+
+    with stopwatch.stage("rhythms"):
+        for npc in npcs:
+            w.rhythms.feed(npc, random.randint(5, 10))
+            w.rhythms.sleep(npc, random.randint(5, 10))
+
+    with stopwatch.stage("enterprises"):
+        for i in range(params.n_enterprises):
+            w.enterprises.generate(
+                w, ZoneType.Restaurant
+            )  # TODO: Generate other enterprises
+
+    with stopwatch.stage("mingle"):
+        w.friendships.mingle(w, params.friends_per_npc)
+
+    jobs_and_houses.run(w, stopwatch)
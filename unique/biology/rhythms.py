@@ -1,6 +1,6 @@
 from enum import Enum
 from functools import total_ordering
-from typing import Dict
+from typing import Dict, Iterable, List
 
 from ..event import Event, Verbs
 from ..npc import NPCHandle
@@ -34,39 +34,75 @@ class Spectrum(Enum):
         return self.value < other.value
 
 
+# quantities are kept one byte per NPC, so bytes.translate() can update or
+# classify all of them at once
+_CAP = 10
+
+
+def _spectrum_of(value: int) -> Spectrum:
+    if value >= 10:
+        return Spectrum.Capped
+    if value >= 8:
+        return Spectrum.Satisfied
+    if value >= 6:
+        return Spectrum.Scheduled
+    if value >= 3:
+        return Spectrum.Desperate
+    return Spectrum.Emergency
+
+
+_SPECTRA: List[Spectrum] = [_spectrum_of(value) for value in range(_CAP + 1)]
+
+# translation tables from a quantity to...
+# ...the same quantity, one time period later
+_ADVANCE = bytes(max(0, value - 1) for value in range(256))
+# ...its spectrum's value
+_SPECTRUM_VALUES = bytes(_SPECTRA[min(value, _CAP)].value for value in range(256))
+# ...1 if its spectrum is at least as needy as the key, else 0
+_AT_LEAST: Dict[Spectrum, bytes] = {
+    spectrum: bytes(_SPECTRA[min(value, _CAP)] >= spectrum for value in range(256))
+    for spectrum in Spectrum
+}
+
+
 class Rhythm(object):
+    # one quantity per NPC, indexed by the slots Rhythms hands out
     def __init__(self):
-        self._quantity: Dict[NPCHandle, int] = {}
+        self._quantity = bytearray()
+
+    def grow(self, n_slots: int):
+        # new NPCs start out at 0
+        self._quantity.extend(bytes(n_slots - len(self._quantity)))
 
     def advance_time(self):
-        for k in list(self._quantity.keys()):
-            self._quantity[k] = max(0, self._quantity[k] - 1)
+        self._quantity = self._quantity.translate(_ADVANCE)
 
-    def feed(self, npc: NPCHandle, quantity: int):
-        assert isinstance(npc, NPCHandle)
-        assert isinstance(quantity, int)
+    def feed(self, slot: int, quantity: int):
+        assert isinstance(slot, int)
+        assert isinstance(quantity, int) and quantity >= 0
 
-        self._quantity[npc] = min(10, self._quantity.get(npc, 0) + quantity)
+        self._quantity[slot] = min(_CAP, self._quantity[slot] + quantity)
 
-    def get(self, npc: NPCHandle) -> Spectrum:
-        assert isinstance(npc, NPCHandle)
+    def get(self, slot: int) -> Spectrum:
+        assert isinstance(slot, int)
+        return _SPECTRA[self._quantity[slot]]
 
-        value = self._quantity.get(npc, 0)
-        return (
-            Spectrum.Capped
-            if value >= 10
-            else Spectrum.Satisfied
-            if value >= 8
-            else Spectrum.Scheduled
-            if value >= 6
-            else Spectrum.Desperate
-            if value >= 3
-            else Spectrum.Emergency
-        )
+    def spectrum_array(self) -> bytes:
+        # Spectrum.value for each slot
+        return self._quantity.translate(_SPECTRUM_VALUES)
+
+    def mask_at_least(self, spectrum: Spectrum) -> bytes:
+        # 1 for each slot whose spectrum is >= spectrum, else 0
+        assert isinstance(spectrum, Spectrum)
+        return self._quantity.translate(_AT_LEAST[spectrum])
 
 
 class Rhythms(object):
     def __init__(self):
+        # every NPC we've heard of gets a slot in each rhythm
+        self._slots: Dict[NPCHandle, int] = {}
+        self._npcs: List[NPCHandle] = []
+
         self._sleepiness = Rhythm()
         self._hunger = Rhythm()
 
@@ -74,6 +110,26 @@ class Rhythms(object):
         self._sleepiness.advance_time()
         self._hunger.advance_time()
 
+    def track(self, npcs: Iterable[NPCHandle]):
+        # make sure all of npcs have slots, so the masks cover them
+        for npc in sorted(set(npcs) - self._slots.keys()):
+            self._slot(npc)
+
+    def npcs(self) -> List[NPCHandle]:
+        # the NPC for each slot: use with the masks, ex. itertools.compress
+        return self._npcs
+
+    def _slot(self, npc: NPCHandle) -> int:
+        assert isinstance(npc, NPCHandle)
+
+        slot = self._slots.get(npc)
+        if slot is None:
+            slot = self._slots[npc] = len(self._npcs)
+            self._npcs.append(npc)
+            self._sleepiness.grow(len(self._npcs))
+            self._hunger.grow(len(self._npcs))
+        return slot
+
     def notify(self, world: "World", event: Event):
         from ..scene_flags import SceneFlag
 
@@ -90,16 +146,28 @@ class Rhythms(object):
                     self.sleep(npc, 3)
 
     def sleep(self, npc: NPCHandle, quantity: int):
-        self._sleepiness.feed(npc, quantity)
+        self._sleepiness.feed(self._slot(npc), quantity)
 
     def feed(self, npc: NPCHandle, quantity: int):
-        self._hunger.feed(npc, quantity)
+        self._hunger.feed(self._slot(npc), quantity)
 
     def get_sleepiness(self, npc: NPCHandle) -> Spectrum:
-        return self._sleepiness.get(npc)
+        return self._sleepiness.get(self._slot(npc))
 
     def get_hunger(self, npc: NPCHandle) -> Spectrum:
-        return self._hunger.get(npc)
+        return self._hunger.get(self._slot(npc))
+
+    def sleepiness_spectrum_array(self) -> bytes:
+        return self._sleepiness.spectrum_array()
+
+    def hunger_spectrum_array(self) -> bytes:
+        return self._hunger.spectrum_array()
+
+    def mask_can_sleep(self) -> bytes:
+        return self._sleepiness.mask_at_least(Spectrum.Scheduled)
+
+    def mask_very_sleepy(self) -> bytes:
+        return self._sleepiness.mask_at_least(Spectrum.Emergency)
 
     def can_sleep(self, npc: NPCHandle) -> bool:
         # NOTE: Check this against the NPC's sleep schedule, don't say "yes" unless it's sleeping time
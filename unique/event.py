@@ -1,4 +1,16 @@
-from typing import NamedTuple, Tuple, Union
+from collections import deque
+from itertools import count
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
 
 class Event(NamedTuple):
@@ -38,6 +50,81 @@ class Verbs(object):
         return verb in cls.QUEST_ONLY
 
 
+Listener = Callable[["World", Event], None]
+
+
+class _Subscription(NamedTuple):
+    order: int  # listeners hear events in this order: see subscribe()
+    seq: int  # (ties go by when they subscribed)
+    listener: Listener
+
+
+class EventBus(object):
+    # Delivers each event only to whatever subscribed to its verb.
+    #
+    # A subscription can also be narrowed to one NPC: then it only hears
+    # events whose first argument is that NPC.
+    def __init__(self):
+        self._queue: Deque[Event] = deque()
+        self._publishing = False
+
+        self._order = count()
+        self._seq = count()
+        self._by_verb: Dict[str, List[_Subscription]] = {verb: [] for verb in Verbs.ALL}
+        self._by_verb_npc: Dict[Tuple[str, "NPCHandle"], List[_Subscription]] = {}
+
+    def subscribe(
+        self,
+        verbs: Iterable[str],
+        listener: Listener,
+        npc: Optional["NPCHandle"] = None,
+        order: Optional[int] = None,
+    ):
+        # listeners hear events in the order they subscribed, unless given a
+        # place in line from reserve_order()
+        from .npc import NPCHandle
+
+        assert npc is None or isinstance(npc, NPCHandle)
+
+        if order is None:
+            order = next(self._order)
+        subscription = _Subscription(order, next(self._seq), listener)
+        for verb in verbs:
+            assert verb in Verbs.ALL
+            if npc is None:
+                self._by_verb[verb].append(subscription)
+            else:
+                self._by_verb_npc.setdefault((verb, npc), []).append(subscription)
+
+    def reserve_order(self) -> int:
+        # a place in line for subscriptions that will be made later
+        return next(self._order)
+
+    def publish(self, world: "World", event: Event):
+        # events sent while handling an event wait until it's been handled
+        self._queue.append(event)
+        if self._publishing:
+            return
+
+        self._publishing = True
+        try:
+            while self._queue:
+                self._deliver(world, self._queue.popleft())
+        finally:
+            self._publishing = False
+
+    def _deliver(self, world: "World", event: Event):
+        subscriptions = self._by_verb[event.verb]
+        if event.args and self._by_verb_npc:
+            for_npc = self._by_verb_npc.get((event.verb, event.args[0]))
+            if for_npc:
+                subscriptions = sorted(subscriptions + for_npc)
+
+        # copy: listeners may subscribe things as a result of this
+        for subscription in list(subscriptions):
+            subscription.listener(world, event)
+
+
 # -- Typechecking --
 from typing import TYPE_CHECKING
 
@@ -47,6 +134,7 @@ if TYPE_CHECKING:
     from .notifications import NotificationHandle
     from .npc import NPCHandle
     from .scene_flags import SceneFlag
+    from .world import World
 
     Arg = Union[
         str,
@@ -3,6 +3,8 @@ from typing import (
     TYPE_CHECKING,
     Callable,
     Dict,
+    FrozenSet,
+    Iterable,
     List,
     NamedTuple,
     Optional,
@@ -29,6 +31,18 @@ class EventMonitors(object):
         )  # arbitrary set populated by calling key() on EventMonitors
         self._sym = Gensym("EM")
 
+        # which monitors want to hear about each verb, in the order they were added
+        self._by_verb: Dict[str, Dict[EMHandle, None]] = {
+            verb: {} for verb in Verbs.ALL
+        }
+
+        # which monitors might claim items with each name, in the order they were added
+        self._by_claim_name: Dict[str, Dict[EMHandle, None]] = {}
+
+        # a monitor's status can only change when it's notified of something,
+        # so it's kept here until then
+        self._status_cache: Dict[EMHandle, Optional[QuestStatus]] = {}
+
         self._most_recent_status: Dict[EMHandle, QuestStatus] = {}
         self._accepted_quests: List[EMHandle] = []
         self._failed_quests: List[EMHandle] = []
@@ -50,8 +64,12 @@ class EventMonitors(object):
         assert isinstance(em, EventMonitor)
         self._active[handle] = em
         self._active_keys.add(em.key())
+        for verb in em.verbs():
+            self._by_verb[verb][handle] = None
+        for name in em.claims_names():
+            self._by_claim_name.setdefault(name, {})[handle] = None
 
-        quest_status = self._active[handle].quest_status(world)
+        quest_status = self._quest_status(world, handle)
         if quest_status:
             if quest_status.is_challenge:
                 # skip the notification, always accepted
@@ -90,18 +108,47 @@ class EventMonitors(object):
         return list(self._accepted_quests)
 
     def who_wants(self, world: "World", item: "Item") -> Optional["NPCHandle"]:
-        from .item import Item
-        from .inventory import ClaimBox, HypotheticalClaimException
+        return self.who_wants_all(world, [item]).get(item)
 
-        assert isinstance(item, Item)
+    def who_wants_all(
+        self, world: "World", items: Iterable["Item"]
+    ) -> Dict["Item", "NPCHandle"]:
+        from .item import Item
 
-        claim_box = ClaimBox(world.inventory.claims, item, hypothetical=True)
-        try:
-            self.notify(world, Event.new(Verbs.Claim, (claim_box,)))
-            return None
-        except HypotheticalClaimException as hce:
-            assert isinstance(hce.claimant, EMHandle)
-            return self._active[hce.claimant].quest_status(world).assigner
+        # For each item, the assigner of the quest that would get it if it
+        # were claimed right now: the first one, in the order notify() would
+        # ask them, that would_claim() it. Items nobody wants are left out
+        wanted = {}
+        for item in items:
+            assert isinstance(item, Item)
+
+            for handle in self._by_claim_name.get(item.profile.name, ()):
+                if not self._should_notify(world, handle, Verbs.Claim):
+                    continue
+                if self._active[handle].would_claim(world, item):
+                    wanted[item] = self._quest_status(world, handle).assigner
+                    break
+        return wanted
+
+    def _quest_status(
+        self, world: "World", handle: EMHandle
+    ) -> Optional["QuestStatus"]:
+        if handle not in self._status_cache:
+            self._status_cache[handle] = self._active[handle].quest_status(world)
+        return self._status_cache[handle]
+
+    def _should_notify(self, world: "World", handle: EMHandle, verb: str) -> bool:
+        if not Verbs.quest_only(verb):
+            return True
+
+        quest_status = self._quest_status(world, handle)
+        if not (quest_status and quest_status.outcome == QuestOutcome.InProgress):
+            return False
+
+        if verb == Verbs.Claim and handle not in self._accepted_quests:
+            return False
+
+        return True
 
     def notify(self, world: "World", event: "Event"):
         from .inventory import ClaimBox
@@ -113,26 +160,20 @@ class EventMonitors(object):
         # TODO: Make sure handle order is maintained thru serialization/deserialization, so this remains deterministic
         done_ems = set()
 
+        # Monitors that don't care about this verb aren't notified. Their
+        # status can't have changed, so there's nothing to check for them
         # TODO: For Claim, iterate in quest precedence order here -- that is, love > friend > normal
-        for handle, em in self._active.items():
-            quest_status = em.quest_status(world)
-            verb = event.verb
-
-            if Verbs.quest_only(verb):
-                should_notify = (
-                    quest_status and quest_status.outcome == QuestOutcome.InProgress
-                )
-
-                if verb == Verbs.Claim and handle not in self._accepted_quests:
-                    should_notify = False
-            else:
-                should_notify = True
+        verb = event.verb
+        for handle in list(self._by_verb[verb]):
+            em = self._active[handle]
+            quest_status = self._quest_status(world, handle)
 
-            if should_notify:
+            if self._should_notify(world, handle, verb):
                 if em.notify(world, event) == Done.Done:
                     done_ems.add(handle)
 
-                quest_status = em.quest_status(world)
+                del self._status_cache[handle]
+                quest_status = self._quest_status(world, handle)
 
             if quest_status is not None:
                 if quest_status.outcome == QuestOutcome.Failed:
@@ -156,6 +197,13 @@ class EventMonitors(object):
         for d in sorted(done_ems):
             self._active_keys.remove(self._active[d].key())
             world.notifications.remove_for(d, NotificationReason.AnnounceQuest)
+            for verb in self._active[d].verbs():
+                del self._by_verb[verb][d]
+            for name in self._active[d].claims_names():
+                del self._by_claim_name[name][d]
+                if not self._by_claim_name[name]:
+                    del self._by_claim_name[name]
+            del self._status_cache[d]
             del self._active[d]
 
     def send_finalize_quest(
@@ -184,6 +232,20 @@ class EventMonitors(object):
 
 @runtime_checkable
 class EventMonitor(Protocol):
+    def verbs(self) -> FrozenSet[str]:
+        # the only verbs notify() will be called with. (It's called for every
+        # verb unless this is overridden.) Must not change over time
+        return frozenset(Verbs.ALL)
+
+    def claims_names(self) -> FrozenSet[str]:
+        # names of the items this might ever claim. Must not change over time
+        return frozenset()
+
+    def would_claim(self, world: "World", item: "Item") -> bool:
+        # whether notify() would claim item if it were offered right now.
+        # Must not change anything
+        return False
+
     def notify(self, world: "World", event: "Event") -> Optional["Done"]:
         raise NotImplementedError()
 
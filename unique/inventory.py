@@ -20,7 +20,7 @@ class Inventory(object):
         assert isinstance(world, World)
         assert isinstance(item, Item)
 
-        claim_box = ClaimBox(self.claims, item, hypothetical=False)
+        claim_box = ClaimBox(self.claims, item)
         world.notify(Event.new(Verbs.Claim, (claim_box,)))
 
         if not claim_box.taken:
@@ -78,15 +78,13 @@ class Claims(object):
 
 
 class ClaimBox(object):
-    def __init__(self, claims, item, hypothetical):
+    def __init__(self, claims, item):
         assert isinstance(claims, Claims)
         assert isinstance(item, Item)
-        assert isinstance(hypothetical, bool)
 
         self._claims = claims
         self._item = item
         self._taken: bool = False
-        self._hypothetical = hypothetical
 
     @property
     def taken(self) -> bool:
@@ -97,20 +95,11 @@ class ClaimBox(object):
         return self._item
 
     def claim(self, quest: EMHandle) -> ClaimHandle:
-        if self._hypothetical:
-            raise HypotheticalClaimException(quest)
-
         handle = self._claims.claim(quest, self._item)
         self._taken = True
         return handle
 
 
-class HypotheticalClaimException(Exception):
-    def __init__(self, quest):
-        Exception.__init__(self)
-        self.claimant = quest
-
-
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
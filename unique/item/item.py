@@ -110,6 +110,48 @@ class Item(NamedTuple):
             profile, occludes_npc_spawn, buy_price, tuple(sorted({*keywords})), tup
         )
 
+    def to_plain(self) -> list:
+        # (plain data, for level files)
+        profile = self.profile
+        return [
+            [
+                profile.name,
+                profile.icon,
+                profile.double_icon,
+                None if profile.bg is None else profile.bg.color,
+                None if profile.fg is None else profile.fg.color,
+            ],
+            self.occludes_npc_spawn,
+            self.buy_price,
+            list(self.keywords),
+            [[c.resource.name, c.n] for c in self.contributions],
+        ]
+
+    @classmethod
+    def from_plain(cls, plain: list) -> "Item":
+        (
+            (name, icon, double_icon, bg, fg),
+            occludes_npc_spawn,
+            buy_price,
+            keywords,
+            contributions,
+        ) = plain
+        return Item(
+            profile=Profile(
+                name,
+                icon,
+                double_icon,
+                None if bg is None else Color(bg),
+                None if fg is None else Color(fg),
+            ),
+            occludes_npc_spawn=occludes_npc_spawn,
+            buy_price=buy_price,
+            keywords=tuple(keywords),
+            contributions=tuple(
+                Contribution(Resource[resource], n) for resource, n in contributions
+            ),
+        )
+
     def plus_keywords(self, keywords: Iterable[str]) -> "Item":
         i2 = Item(
             profile=self.profile,
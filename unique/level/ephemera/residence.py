@@ -13,16 +13,18 @@ def generate(world: "World", ll: LoadedLevel):
     junk = list(ALL.get_all_by_keywords("junk"))
     assert len(junk) > 0
 
+    to_put = []
     for v2 in ll.in_bounds:
         if v2 in ll.blocks:
             continue
 
-        if any(ll.items.view(v2)):
+        if ll.items.has_any(v2):
             continue
 
         if random.random() < 0.1:
-            ll.items.put(v2, random.choice(junk), ephemeral=True)
-    pass
+            to_put.append((v2, random.choice(junk)))
+
+    ll.items.put_many(to_put, ephemeral=True)
 
 
 from typing import TYPE_CHECKING
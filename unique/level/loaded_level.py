@@ -1,9 +1,10 @@
 import os.path
-from typing import Dict, Iterator, List, NamedTuple, Optional, Set
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 
+from ds.bitmap import Bitmap
 from ds.gensym import Gensym, Sym
 from ds.relational import OneToMany
-from ds.vecs import V2
+from ds.vecs import R2, V2
 
 from ..item import Item
 from ..npc import NPCHandle
@@ -35,29 +36,46 @@ class Items(object):
     def __init__(self):
         self._sym: Gensym = Gensym("SPN")
         self._values: Dict[SpawnHandle, Spawn] = {}
-        self._placement: OneToMany[V2, SpawnHandle] = OneToMany()
+
+        # the spawns at each position, in the order they were put there
+        self._at: Dict[V2, Dict[SpawnHandle, Spawn]] = {}
+        self._where: Dict[SpawnHandle, V2] = {}
 
         self._junk_left = 0
 
     def put(self, at: V2, item: Item, ephemeral: bool) -> SpawnHandle:
         handle = SpawnHandle(self._sym.gen())
+        spawn = Spawn.new(handle, item, ephemeral)
 
-        self._values[handle] = Spawn.new(handle, item, ephemeral)
-        self._placement.add(at, handle)
+        self._values[handle] = spawn
+        spawns = self._at.get(at)
+        if spawns is None:
+            spawns = self._at[at] = {}
+        spawns[handle] = spawn
+        self._where[handle] = at
 
-        if self._values[handle].is_junk:
+        if spawn.is_junk:
             self._junk_left += 1
 
         return handle
 
+    def put_many(
+        self, items: Iterable[Tuple[V2, Item]], ephemeral: bool
+    ) -> List[SpawnHandle]:
+        return [self.put(at, item, ephemeral) for at, item in items]
+
     def has(self, sh: SpawnHandle) -> bool:
         return sh in self._values
 
     def take(self, sh: SpawnHandle) -> Item:
         assert sh in self._values
-        spawn = self._values[sh]
-        self._placement.remove_b(sh)
-        del self._values[sh]
+        spawn = self._values.pop(sh)
+
+        at = self._where.pop(sh)
+        spawns = self._at[at]
+        del spawns[sh]
+        if len(spawns) == 0:
+            del self._at[at]
 
         if spawn.is_junk:
             self._junk_left -= 1
@@ -65,10 +83,18 @@ class Items(object):
         return spawn.item
 
     def view(self, at: V2) -> List[Spawn]:
-        return [
-            self._values[sh]
-            for sh in sorted(self._placement.get_bs(at), key=lambda sh: sh.ident)
-        ]
+        # oldest first
+        spawns = self._at.get(at)
+        if spawns is None:
+            return []
+        return list(spawns.values())
+
+    def has_any(self, at: V2) -> bool:
+        return at in self._at
+
+    def count(self, at: V2) -> int:
+        spawns = self._at.get(at)
+        return 0 if spawns is None else len(spawns)
 
     @property
     def junk_left(self):
@@ -88,18 +114,39 @@ class LoadedLevel(object):
         self.ident = ident
         self.wallpaper = wallpaper
         self.in_bounds: Set[V2] = in_bounds
+        # fixed once the level is loaded: caches of anything derived from
+        # blocks (FOV, tiles) are keyed on ident alone
         self.blocks: Dict[V2, Block] = blocks
-        self.seen: Set[V2] = set()  # every time the player sees a tile, add it to this
+        # every time the player sees a tile, add it to this
+        self.seen: Bitmap = Bitmap()
         self.items: Items = Items()
-        for v2, items in items.items():
-            for item in items:
-                self.items.put(v2, item, False)  # no ephemeral items
+        self.items.put_many(
+            ((v2, item) for v2, items in items.items() for item in items),
+            False,  # no ephemeral items
+        )
         self.npc_sites: OneToMany[V2, NPCHandle] = npc_sites
 
     def npc_location(self, npc: NPCHandle) -> Optional[V2]:
         assert isinstance(npc, NPCHandle)
         return self.npc_sites.get_a(npc)
 
+    def npcs_in(self, rect: R2) -> List[NPCHandle]:
+        # NPCs standing in rect, oldest first. Cost is by area, not population
+        found = []
+        for xy in rect:
+            found.extend(self.npc_sites.get_bs(xy))
+        found.sort()
+        return found
+
+    def npcs_near(self, xy: V2, distance: int) -> List[NPCHandle]:
+        # NPCs within manhattan distance of xy, oldest first
+        reach = V2.new(distance, distance)
+        return [
+            npc
+            for npc in self.npcs_in((xy - reach).to(xy + reach + V2.new(1, 1)))
+            if xy.manhattan(self.npc_sites.get_a(npc)) <= distance
+        ]
+
     def loaded_npcs(self) -> Iterator[NPCHandle]:
         for npc in self.npc_sites.all_bs():
             yield npc
@@ -2,6 +2,7 @@ from typing import Set
 
 from .carve_op import *
 from .interior_designer import InteriorDesigner
+from .occupancy import Occupancy, at, rows_around
 from .recs import *
 
 
@@ -13,6 +14,7 @@ class Carve(object):
 
         self._rooms = FastGensym()
         self._room_tiles: OneToMany[RoomHandle, V2] = OneToMany()
+        self._occupancy = Occupancy()  # same info as _room_tiles, as bitmaps
         self._room_types: Dict[RoomHandle, RoomType] = {}
         self._room_frozen = set()
         self._links: List[Link] = []
@@ -54,6 +56,10 @@ class Carve(object):
         self._room_tiles = _room_tiles_2
         self._hints = _hints_2
 
+        self._occupancy = Occupancy()
+        for rh, v2 in self._room_tiles.all():
+            self._occupancy.move(v2, None, rh)
+
     @contextmanager
     def veto_point(self):
         pt = len(self._operation_log)
@@ -94,10 +100,7 @@ class Carve(object):
             self._room_types[rh] = operation.room_type
             return rh
         elif isinstance(operation, CarveTile):
-            if operation.new_owner is None:
-                self._room_tiles.remove_b(operation.position)
-            else:
-                self._room_tiles.add(operation.new_owner, operation.position)
+            self._set_owner(operation.position, operation.new_owner)
         elif isinstance(operation, FreezeRoom):
             self._room_frozen.add(operation.room)
         elif isinstance(operation, LinkRooms):
@@ -112,10 +115,7 @@ class Carve(object):
             rh = self._rooms.ungen()
             del self._room_types[RoomHandle(rh)]
         elif isinstance(operation, CarveTile):
-            if operation.old_owner is None:
-                self._room_tiles.remove_b(operation.position)
-            else:
-                self._room_tiles.add(operation.old_owner, operation.position)
+            self._set_owner(operation.position, operation.old_owner)
         elif isinstance(operation, FreezeRoom):
             self._room_frozen.discard(operation.room)
         elif isinstance(operation, LinkRooms):
@@ -123,6 +123,13 @@ class Carve(object):
         else:
             raise AssertionError("what is {}?".format(operation))
 
+    def _set_owner(self, v2: V2, owner: Optional[RoomHandle]):
+        self._occupancy.move(v2, self._room_tiles.get_a(v2), owner)
+        if owner is None:
+            self._room_tiles.remove_b(v2)
+        else:
+            self._room_tiles.add(owner, v2)
+
     def carve(
         self, r: R2, room_type: RoomType, ignore: List[RoomHandle] = None
     ) -> RoomHandle:
@@ -141,7 +148,9 @@ class Carve(object):
             if existing_room in self._room_frozen:
                 self.veto()
 
-            affected_rooms[existing_room] = len(list(self._room_tiles.get_bs(v)))
+            # (size before this carve touched it: unclaimed space can't be ruined)
+            if existing_room is not None and existing_room not in affected_rooms:
+                affected_rooms[existing_room] = self._room_tiles.count_bs(existing_room)
 
             if v in r:
                 self._carve_point(v, h)
@@ -149,7 +158,7 @@ class Carve(object):
                 self._carve_point(v, None)
 
         for r, previous_area in affected_rooms.items():
-            new_area = len(list(self._room_tiles.get_bs(r)))
+            new_area = self._room_tiles.count_bs(r)
             if self._ruined(r, previous_area, new_area):
                 self.veto()
 
@@ -171,80 +180,93 @@ class Carve(object):
         return False
 
     def expand_densely(self, r: RoomHandle):
-        claimed = lambda tile: self._room_tiles.get_a(tile) is not None
-        claimed_not_me = lambda tile: self._room_tiles.get_a(tile) not in [None, r]
-        claimed_me = lambda tile: self._room_tiles.get_a(tile) == r
-
-        change_made = True
-        while change_made:
-            to_add = set()
-
-            # TODO: Make sure all the neighbors of the tile we wanna get are either unclaimed or claimed by the current room,
-            # so we don't edge into a closet or something. I'm p. sure bugs related to this are happening.
-            for d in [V2.new(-1, 0), V2.new(0, -1), V2.new(1, 0), V2.new(0, 1)]:
-                for t in self._room_tiles.get_bs(r):
-                    t1 = claimed(t + d)
-                    if t1:
-                        continue
-
-                    for t2 in (t + d).neighbors():
-                        if claimed_not_me(t2):
-                            continue
+        while True:
+            to_add = self._occupancy.positions(self._dense_expansion(r))
+            if len(to_add) == 0:
+                break
 
-                    if claimed_me(t + d + d):
-                        to_add.add(t + d)
-                        continue
+            for t in to_add:
+                self._carve_point(t, r)
 
-                    t2 = claimed(t + d + d)
-                    if t2:
-                        continue
+    def _dense_expansion(self, r: RoomHandle) -> Dict[int, int]:
+        # Unclaimed tiles next to r that should join it: either r is on the
+        # other side, or another room is, close enough that the gap would be
+        # wasted.
+        # TODO: Make sure all the neighbors of the tile we wanna get are either unclaimed or claimed by the current room,
+        # so we don't edge into a closet or something. I'm p. sure bugs related to this are happening.
+        claimed = self._occupancy.claimed()
+        mine = self._occupancy.room(r)
+
+        # (where the tile would grow from, then 1, 2, 3 and 4 tiles further out)
+        reaches = [
+            (-d, d, d * 2, d * 3, d * 4)
+            for d in [V2.new(-1, 0), V2.new(0, -1), V2.new(1, 0), V2.new(0, 1)]
+        ]
+        here = V2.zero()
+
+        to_add = {}
+        for y in rows_around(mine, 1):
+            row = 0
+            for back, d1, d2, d3, d4 in reaches:
+                beside_me = at(mine, y, back)
+                if not beside_me:
+                    continue
 
-                    t3 = claimed(t + d + d + d)
-                    t4 = claimed(t + d + d + d + d)
-                    t5 = claimed(t + d + d + d + d + d)
+                claimed_past = at(claimed, y, d2) | at(claimed, y, d3)
+                claimed_past |= at(claimed, y, d4)
+                row |= (
+                    beside_me
+                    & ~at(claimed, y, here)
+                    & (at(mine, y, d1) | (~at(claimed, y, d1) & claimed_past))
+                )
 
-                    if (t5 and not any([t4, t3])) or (t4 and not any([t3])) or t3:
-                        to_add.add(t + d)
+            if row:
+                to_add[y] = row
 
-            change_made = len(to_add) > 0
-            for t in to_add:
-                self._carve_point(t, r)
+        return to_add
 
     def erode(self, r: RoomHandle, iterations):
-        claimed = lambda tile: self._room_tiles.get_a(tile) is not None
+        for i in range(iterations):
+            for t in self._occupancy.positions(self._erosion(r)):
+                self._carve_point(t, None)
 
+    def _erosion(self, r: RoomHandle) -> Dict[int, int]:
+        # tiles of r with nothing claimed within two tiles on two adjacent sides
+        claimed = self._occupancy.claimed()
         directions1 = [V2.new(-1, 0), V2.new(0, -1), V2.new(1, 0), V2.new(0, 1)]
         directions2 = directions1[1:] + directions1[:1]
 
-        for i in range(iterations):
-            to_remove = set()
+        to_remove = {}
+        for y, mine in self._occupancy.room(r).items():
+            row = 0
             for d1, d2 in zip(directions1, directions2):
-                for t in self._room_tiles.get_bs(r):
-                    tu1 = claimed(t + d1)
-                    tu2 = claimed(t + d1 + d1)
-                    tl1 = claimed(t + d2)
-                    tl2 = claimed(t + d2 + d2)
-                    if not (tu1 or tu2 or tl1 or tl2):
-                        to_remove.add(t)
-
-            for t in to_remove:
-                self._carve_point(t, None)
+                near = at(claimed, y, d1) | at(claimed, y, d1 * 2)
+                near |= at(claimed, y, d2) | at(claimed, y, d2 * 2)
+                row |= mine & ~near
+
+            if row:
+                to_remove[y] = row
+
+        return to_remove
 
     def erode_1tile_wonk(self, r: RoomHandle):  # removes one-tile bacon strips
-        claimed = lambda tile: self._room_tiles.get_a(tile) is not None
-
-        to_remove = set()
-        directions = [V2.new(-1, 0), V2.new(0, -1)]
-        for d in directions:
-            for t in self._room_tiles.get_bs(r):
-                tl = claimed(t + d)
-                tr = claimed(t - d)
-                if not (tl or tr):
-                    to_remove.add(t)
-
-        for t in to_remove:
+        for t in self._occupancy.positions(self._wonk(r)):
             self._carve_point(t, None)
 
+    def _wonk(self, r: RoomHandle) -> Dict[int, int]:
+        claimed = self._occupancy.claimed()
+
+        to_remove = {}
+        for y, mine in self._occupancy.room(r).items():
+            row = 0
+            for d in [V2.new(-1, 0), V2.new(0, -1)]:
+                row |= mine & ~(at(claimed, y, d) | at(claimed, y, -d))
+
+            if row:
+                to_remove[y] = row
+
+        return to_remove
+
     def ident_rooms(self, room_type: RoomType) -> List[RoomHandle]:
         found = []
         for room in self._room_tiles.all_as():
@@ -484,14 +506,8 @@ class Carve(object):
         sites = [
             site
             for site in sites
-            if len(
-                [
-                    t
-                    for t in site
-                    if self._has_contact(
-                        room_handle, site, t, 1 if use_ignore else 2, -direction
-                    )
-                ]
+            if self._count_contacts(
+                room_handle, site, 1 if use_ignore else 2, -direction
             )
             >= min_contact
         ]
@@ -509,10 +525,7 @@ class Carve(object):
             return random.choice(sites)
 
         if rule == Rule.Dense:
-            scores = [
-                len([t for t in site if self._has_contact(None, site, t, 2)])
-                for site in sites
-            ]
+            scores = [self._count_contacts(None, site, 2) for site in sites]
             max_score = max(scores)
             sites_with_max = [
                 site for site, score in zip(sites, scores) if score == max_score
@@ -521,43 +534,49 @@ class Carve(object):
 
         raise AssertionError("unknown rule: %s" % rule)
 
-    def _has_contact(
+    def _count_contacts(
         self,
         room_handle: Optional[RoomHandle],
         site: R2,
-        tile: V2,
         distance: int,
         direction: Optional[V2] = None,
-    ) -> bool:
+    ) -> int:
+        # Count the tiles of site that are in contact with room_handle: that
+        # room is exactly distance away in some direction, and all the tiles on
+        # the way are empty and outside site.
+        # If room_handle is None, the tile distance away must be empty instead.
         assert direction is None or isinstance(direction, V2)
 
-        for dir in (
-            [direction]
-            if direction is not None
-            else [
-                V2.new(1, 0),
-                V2.new(0, 1),
-                V2.new(-1, 0),
-                V2.new(0, -1),
-            ]
-        ):
-            t = tile
-            if room_handle is None:
-                # contact w/ any room
-                if self._room_tiles.get_a(t + dir * distance) is not None:
-                    continue
-            else:
-                # contact period
-                if self._room_tiles.get_a(t + dir * distance) != room_handle:
-                    continue
+        site_rows = self._occupancy.rect(site)
+        claimed = self._occupancy.claimed()
 
-            for i in range(distance - 1):
-                t = t + dir
-                if t in site or self._room_tiles.get_a(t) is not None:
-                    break
-            else:
-                # ends in the right place and all the tiles on the way are empty
-                return True
+        if direction is not None:
+            directions = [direction]
+        else:
+            directions = [V2.new(1, 0), V2.new(0, 1), V2.new(-1, 0), V2.new(0, -1)]
+        # (the far tile, then the tiles on the way there)
+        paths = [
+            (dir * distance, [dir * i for i in range(1, distance)])
+            for dir in directions
+        ]
+        if room_handle is not None:
+            target = self._occupancy.room(room_handle)
+
+        n = 0
+        for y, row in site_rows.items():
+            contact = 0
+            for far, on_the_way in paths:
+                if room_handle is None:
+                    touching = row & ~at(claimed, y, far)
+                else:
+                    touching = row & at(target, y, far)
+                for step in on_the_way:
+                    touching &= ~(at(claimed, y, step) | at(site_rows, y, step))
+                contact |= touching
+
+            n += bin(contact).count("1")
+
+        return n
 
 
 from typing import TYPE_CHECKING
@@ -0,0 +1,98 @@
+from typing import Dict, Iterator, List, Optional
+
+from ds.vecs import R2, V2
+
+from .recs import RoomHandle
+
+# Keep this many unclaimed columns left of the leftmost tile, so that a mask
+# can be shifted a few tiles left without losing bits off the end.
+_MARGIN = 8
+
+
+class Occupancy(object):
+    # Which tiles are claimed, and by which room, stored as one int per row
+    # per room. Bit i of a row is the tile at x == self._x0 + i.
+    #
+    # This lets neighbourhood tests ("is the tile 3 west of here claimed?")
+    # run on a whole row at once with shifts and masks.
+
+    def __init__(self):
+        self._x0 = -_MARGIN
+        self._claimed: Dict[int, int] = {}
+        self._rooms: Dict[RoomHandle, Dict[int, int]] = {}
+
+    def move(
+        self, v2: V2, old_owner: Optional[RoomHandle], new_owner: Optional[RoomHandle]
+    ):
+        assert isinstance(v2, V2)
+
+        self.reach(v2.x)
+        x, y = v2
+        bit = 1 << (x - self._x0)
+
+        if old_owner is not None:
+            _clear(self._rooms[old_owner], y, bit)
+            _clear(self._claimed, y, bit)
+
+        if new_owner is not None:
+            rows = self._rooms.setdefault(new_owner, {})
+            rows[y] = rows.get(y, 0) | bit
+            self._claimed[y] = self._claimed.get(y, 0) | bit
+
+    def claimed(self) -> Dict[int, int]:
+        return self._claimed
+
+    def room(self, room: RoomHandle) -> Dict[int, int]:
+        return self._rooms.get(room, {})
+
+    def positions(self, masks: Dict[int, int]) -> List[V2]:
+        # every tile set in masks, top to bottom and left to right
+        found = []
+        for y in sorted(masks):
+            mask = masks[y]
+            while mask:
+                low = mask & -mask
+                found.append(V2.new(self._x0 + low.bit_length() - 1, y))
+                mask ^= low
+        return found
+
+    def rect(self, r: R2) -> Dict[int, int]:
+        # r, as masks in the same format as everything else here
+        self.reach(r.top.x)
+        row = ((1 << r.size.x) - 1) << (r.top.x - self._x0)
+        return {y: row for y in range(r.top.y, r.top.y + r.size.y)}
+
+    def reach(self, x: int):
+        # make sure we can represent tiles as far left as x
+        if x - _MARGIN >= self._x0:
+            return
+
+        # rebase everything, leaving some slack so this doesn't happen every time
+        shift = self._x0 - (x - _MARGIN) + 32
+        self._x0 -= shift
+        for rows in [self._claimed, *self._rooms.values()]:
+            for y in rows:
+                rows[y] <<= shift
+
+
+def at(rows: Dict[int, int], y: int, d: V2) -> int:
+    # mask for row y, where bit x is set if (x, y) + d is set in rows
+    mask = rows.get(y + d.y, 0)
+    if d.x >= 0:
+        return mask >> d.x
+    return mask << -d.x
+
+
+def rows_around(rows: Dict[int, int], margin: int) -> Iterator[int]:
+    if not rows:
+        return
+    for y in range(min(rows) - margin, max(rows) + margin + 1):
+        yield y
+
+
+def _clear(rows: Dict[int, int], y: int, bit: int):
+    row = rows.get(y, 0) & ~bit
+    if row:
+        rows[y] = row
+    else:
+        rows.pop(y, None)
@@ -1,10 +1,16 @@
+import json
+import mmap
 import random
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
 from enum import Enum
-from typing import Callable, Dict, List, NamedTuple, Set
+from itertools import compress
+from typing import Callable, Dict, List, NamedTuple, Optional, Set
 
 from ds.code_registry import Ref
 from ds.relational import OneToMany
-from ds.vecs import V2
+from ds.vecs import R2, V2
 
 from ..item import Item
 from ..npc import NPCHandle
@@ -12,6 +18,24 @@ from .block import Block
 from .wallpaper import Wallpaper
 from .loaded_level import LoadedLevel
 
+# packed format: preamble, JSON header, then the raw arrays, each starting
+# on an _ALIGN byte boundary so they can be cast in place. (the header is
+# plain data, not a pickle, so opening a level file can't run code)
+_MAGIC = b"NYLV"
+_VERSION = 2
+_PREAMBLE = struct.Struct("<4sII")  # magic, version, header length
+_ALIGN = 8
+
+_INDEX_TYPECODE = "I"
+_INDEX_SIZE = array(_INDEX_TYPECODE).itemsize
+
+_BLOCKS = sorted(Block, key=lambda b: b.value)
+assert [b.value for b in _BLOCKS] == list(range(len(_BLOCKS)))
+
+
+def _aligned(offset: int) -> int:
+    return offset + -offset % _ALIGN
+
 
 class SpawnType(Enum):
     Sleep = 0
@@ -25,6 +49,21 @@ class SpawnNPC(NamedTuple):
 
 
 class UnloadedLevel(object):
+    # Stored packed, so that lots of these can sit around cheaply:
+    #
+    #  - in_bounds and blocks are one byte per tile over the bounding box
+    #    (0 for "no", 1 + block.value for a block)
+    #  - items is a table of distinct Items, plus two parallel arrays: which
+    #    tile (as an index into the rasters, in ascending order) and which Item
+    #
+    # load() has to hand out sets and dicts that iterate in the same order as
+    # the ones we were made from, or ephemera (which iterate them) come out
+    # different for the same seed. so the tiles in blocks and items are also
+    # kept in the order they came in. in_bounds is a set, which has no order to
+    # keep: it's rebuilt in raster order, which is how InteriorDesigner builds
+    # it, so it ends up with the same hash table
+    #
+    # The arrays can also be memoryviews into an mmapped file. (see open())
     def __init__(
         self,
         player_start_xy: V2,
@@ -45,16 +84,160 @@ class UnloadedLevel(object):
 
         self._player_start_xy = player_start_xy
         self._wallpaper = wallpaper
-        self._in_bounds = in_bounds
-        self._blocks = blocks
-        self._items = items
-        self._npc_spawns = npc_spawns
+        self._npc_spawns: Dict[SpawnType, List[V2]] = {
+            spawn_type: list(vs) for spawn_type, vs in npc_spawns.items()
+        }
         self._ephemera_source = ephemera_source
 
+        xs = [v.x for vs in (in_bounds, blocks, items) for v in vs]
+        ys = [v.y for vs in (in_bounds, blocks, items) for v in vs]
+        if xs:
+            self._bounds = R2.new_4i(min(xs), min(ys), max(xs) + 1, max(ys) + 1)
+        else:
+            self._bounds = R2.new(V2.zero(), V2.zero())
+
+        n_cells = self._bounds.size.x * self._bounds.size.y
+        self._in_bounds = bytearray(n_cells)
+        for v in in_bounds:
+            self._in_bounds[self._cell(v)] = 1
+
+        self._blocks = bytearray(n_cells)
+        self._block_order = array(_INDEX_TYPECODE)
+        for v, block in blocks.items():
+            assert isinstance(block, Block)
+            self._blocks[self._cell(v)] = 1 + block.value
+            self._block_order.append(self._cell(v))
+
+        self._item_table: List[Item] = []
+        item_ixs: Dict[Item, int] = {}
+        self._item_cells = array(_INDEX_TYPECODE)
+        self._item_ixs = array(_INDEX_TYPECODE)
+        for cell, v in sorted((self._cell(v), v) for v in items):
+            for item in items[v]:
+                assert isinstance(item, Item)
+                if item not in item_ixs:
+                    item_ixs[item] = len(self._item_table)
+                    self._item_table.append(item)
+                self._item_cells.append(cell)
+                self._item_ixs.append(item_ixs[item])
+        self._item_order = array(_INDEX_TYPECODE, [self._cell(v) for v in items])
+
     @property
     def player_start_xy(self):
         return self._player_start_xy
 
+    def _cell(self, v: V2) -> int:
+        top, size = self._bounds.top, self._bounds.size
+        return (v.y - top.y) * size.x + (v.x - top.x)
+
+    def _v2(self, cell: int) -> V2:
+        top, size = self._bounds.top, self._bounds.size
+        y, x = divmod(cell, size.x)
+        return V2(top.x + x, top.y + y)
+
+    def _block_at(self, v: V2) -> Optional[Block]:
+        if v not in self._bounds:
+            return None
+        code = self._blocks[self._cell(v)]
+        return None if code == 0 else _BLOCKS[code - 1]
+
+    def _items_at(self, v: V2) -> List[Item]:
+        if v not in self._bounds:
+            return []
+        cell = self._cell(v)
+        lo = bisect_left(self._item_cells, cell)
+        hi = bisect_right(self._item_cells, cell, lo)
+        return [self._item_table[ix] for ix in self._item_ixs[lo:hi]]
+
+    def to_bytes(self) -> bytes:
+        top, size = self._bounds.top, self._bounds.size
+        header = {
+            "bounds": [top.x, top.y, size.x, size.y],
+            "player_start_xy": [self._player_start_xy.x, self._player_start_xy.y],
+            "wallpaper": self._wallpaper.to_plain(),
+            "npc_spawns": [
+                [spawn_type.name, [[v.x, v.y] for v in vs]]
+                for spawn_type, vs in self._npc_spawns.items()
+            ],
+            "ephemera_source": self._ephemera_source.name,
+            "item_table": [item.to_plain() for item in self._item_table],
+            "n_blocks": len(self._block_order),
+            "n_items": len(self._item_cells),
+            "n_item_tiles": len(self._item_order),
+        }
+        header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        chunks = [
+            _PREAMBLE.pack(_MAGIC, _VERSION, len(header)),
+            header,
+            self._in_bounds,
+            self._blocks,
+            self._block_order,
+            self._item_cells,
+            self._item_ixs,
+            self._item_order,
+        ]
+
+        out = bytearray()
+        for chunk in chunks:
+            out += chunk
+            out += bytes(-len(out) % _ALIGN)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, buf) -> "UnloadedLevel":
+        # buf can be anything that supports the buffer protocol. The rasters
+        # become views into it, not copies
+        view = memoryview(buf).cast("B")
+        magic, version, header_len = _PREAMBLE.unpack_from(view, 0)
+        assert magic == _MAGIC, "not a level file"
+        assert version == _VERSION, "unsupported level file version: {}".format(version)
+
+        offset = _aligned(_PREAMBLE.size)
+        header = json.loads(str(view[offset : offset + header_len], "utf-8"))
+        offset = _aligned(offset + header_len)
+        x, y, w, h = header["bounds"]
+
+        def take(n_bytes: int) -> memoryview:
+            nonlocal offset
+            chunk = view[offset : offset + n_bytes]
+            offset = _aligned(offset + n_bytes)
+            return chunk
+
+        def take_indexes(n: int) -> memoryview:
+            return take(n * _INDEX_SIZE).cast(_INDEX_TYPECODE)
+
+        level: UnloadedLevel = cls.__new__(cls)
+        level._player_start_xy = V2.new(*header["player_start_xy"])
+        level._wallpaper = Wallpaper.from_plain(header["wallpaper"])
+        level._npc_spawns = {
+            SpawnType[spawn_type]: [V2.new(vx, vy) for vx, vy in vs]
+            for spawn_type, vs in header["npc_spawns"]
+        }
+        level._ephemera_source = Ref(header["ephemera_source"])
+        level._bounds = R2.new(V2.new(x, y), V2.new(w, h))
+        level._in_bounds = take(w * h)
+        level._blocks = take(w * h)
+        level._block_order = take_indexes(header["n_blocks"])
+        level._item_table = [Item.from_plain(item) for item in header["item_table"]]
+        level._item_cells = take_indexes(header["n_items"])
+        level._item_ixs = take_indexes(header["n_items"])
+        level._item_order = take_indexes(header["n_item_tiles"])
+        return level
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def open(cls, path: str) -> "UnloadedLevel":
+        # the map stays open for as long as the level is around
+        with open(path, "rb") as f:
+            return cls.from_bytes(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __reduce__(self):
+        # pickle (ex: when coming back from a worker process) as the packed form
+        return (UnloadedLevel.from_bytes, (self.to_bytes(),))
+
     def load(
         self, world: "World", ident: "LevelHandle", spawns: List[SpawnNPC]
     ) -> LoadedLevel:
@@ -94,15 +277,16 @@ class UnloadedLevel(object):
             assert found_spot is not None
 
             if any(npc_sites.get_bs(found_spot)):
-                neighbors = [n for n in found_spot.neighbors() if n not in self._blocks]
+                neighbors = [
+                    n for n in found_spot.neighbors() if self._block_at(n) is None
+                ]
                 random.shuffle(neighbors)
                 for n in neighbors:
-                    if n in self._blocks:
+                    if self._block_at(n) is not None:
                         continue
 
-                    if n in self._items:
-                        if any(item.occludes_walk for item in self._items[n]):
-                            continue
+                    if any(item.occludes_walk for item in self._items_at(n)):
+                        continue
 
                     if not any(npc_sites.get_bs(n)):
                         npc_sites.add(n, npc.npc)
@@ -112,13 +296,29 @@ class UnloadedLevel(object):
             else:
                 npc_sites.add(found_spot, npc.npc)
 
+        in_bounds = set()
+        for cell in compress(range(len(self._in_bounds)), self._in_bounds):
+            in_bounds.add(self._v2(cell))
+
+        blocks = {}
+        for cell in self._block_order:
+            blocks[self._v2(cell)] = _BLOCKS[self._blocks[cell] - 1]
+
+        items = {}
+        for cell in self._item_order:
+            items[self._v2(cell)] = []
+        for cell, ix in zip(self._item_cells, self._item_ixs):
+            items[self._v2(cell)].append(self._item_table[ix])
+
         loaded_level = LoadedLevel(
             ident=ident,
             wallpaper=self._wallpaper,
-            in_bounds=set(self._in_bounds),
-            blocks=dict(self._blocks),
+            # (a copy, like the set we were made from would get: copying a set
+            # can change its order)
+            in_bounds=set(in_bounds),
+            blocks=blocks,
             # TODO: Spawn temporary items?
-            items={k: list(v) for k, v in self._items.items()},
+            items=items,
             npc_sites=npc_sites,
         )
         self._ephemera_source.resolve()(world, loaded_level)
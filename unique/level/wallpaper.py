@@ -1,6 +1,6 @@
 from ds.vecs import V2
 from display import Color, Colors, WallColors
-from typing import List, NamedTuple, Set, Tuple, Union, Iterable
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union, Iterable
 import random
 
 
@@ -24,6 +24,15 @@ class WallTile(NamedTuple):
 
         return WallTile(display, fg, cap, flip)
 
+    def to_plain(self) -> list:
+        # (plain data, for level files)
+        return [self.display, self.fg.color, self.cap.color, self.flip]
+
+    @classmethod
+    def from_plain(cls, plain: list) -> "WallTile":
+        display, fg, cap, flip = plain
+        return cls.new(display, Color(fg), Color(cap), flip)
+
     @classmethod
     def default(cls) -> "WallTile":
         return cls.new(display="\xb0\xb0", fg=Colors.WorldFG, cap=Colors.WorldFG)
@@ -92,6 +101,10 @@ class Wallpaper(object):
         self._default = default
         self._layers: List[Tuple[Set[V2], WallTile]] = []
 
+        # for each tile in any layer, the index of the first layer it's in.
+        # Built on the first get(), then kept up to date by add()
+        self._first_layer: Optional[Dict[V2, int]] = None
+
     def set_default(self, default: WallTile):
         assert isinstance(default, WallTile)
         self._default = default
@@ -104,18 +117,56 @@ class Wallpaper(object):
         assert isinstance(layer, Iterable)
         assert isinstance(tile, WallTile)
 
+        layer = set(layer)
+
         # merge layers w/ identical tiles
-        for set_, wt in self._layers:
+        for ix, (set_, wt) in enumerate(self._layers):
             if wt == tile:
                 set_.update(layer)
-                return
+                break
 
         else:
-            self._layers.append((set(layer), tile))
+            ix = len(self._layers)
+            self._layers.append((layer, tile))
+
+        if self._first_layer is not None:
+            for v2 in layer:
+                if self._first_layer.get(v2, ix) >= ix:
+                    self._first_layer[v2] = ix
 
     def get(self, v2: V2) -> WallTile:
-        for vs, wt in self._layers:
-            if v2 in vs:
-                return wt
+        if self._first_layer is None:
+            self._first_layer = {}
+            for ix, (vs, wt) in reversed(list(enumerate(self._layers))):
+                for v in vs:
+                    self._first_layer[v] = ix
+
+        ix = self._first_layer.get(v2)
+        if ix is None:
+            return self._default
+        return self._layers[ix][1]
+
+    def to_plain(self) -> dict:
+        # (plain data, for level files. positions within a layer are sorted, so
+        # a level always packs to the same bytes. layer order is kept: get()
+        # goes by the first layer with the position in it)
+        return {
+            "default": self._default.to_plain(),
+            "layers": [
+                [[[v.x, v.y] for v in sorted(vs)], wt.to_plain()]
+                for vs, wt in self._layers
+            ],
+        }
 
-        return self._default
+    @classmethod
+    def from_plain(cls, plain: dict) -> "Wallpaper":
+        wallpaper = cls(WallTile.from_plain(plain["default"]))
+        for vs, wt in plain["layers"]:
+            wallpaper.add([V2.new(x, y) for x, y in vs], WallTile.from_plain(wt))
+        return wallpaper
+
+    def __getstate__(self):
+        # the index is cheap to rebuild, so don't ship it around
+        state = dict(self.__dict__)
+        state["_first_layer"] = None
+        return state
@@ -132,9 +132,9 @@ def vietnamese_last():
     return multi_pick(VIETNAMESE_LAST)
 
 
-def generate(used_names: Set[str]) -> str:
+def generate(used_names: Set[str], tries: int = 100) -> str:
     assert isinstance(used_names, set)
-    for try_ in range(100):
+    for try_ in range(tries):
         name = _generate()
         if name in used_names:
             continue
@@ -5,27 +5,68 @@ from ds.gensym import Gensym, Sym
 from ds.vecs import V2
 
 from . import namegen
-from .event import Event, Verbs
+from .event import Event, EventBus, Verbs
 from .eventmonitor import Done, EventMonitor, QuestOutcome, QuestStatus
 from typing import Dict, Set
 
+# how many names to come up with before settling for one that's taken
+NAME_TRIES = 100
+NAME_TRIES_USED_UP = 3
+
+# names count as used up once this many NPCs in a row had to settle
+NAME_FAILURES_USED_UP = 5
+
 
 class NPCHandle(NamedTuple):
     ident: Sym
 
 
 class NPCs(object):
-    def __init__(self):
+    def __init__(self, bus: EventBus):
+        assert isinstance(bus, EventBus)
+
         self._all: Dict[NPCHandle, NPC] = {}
         self._sym = Gensym("NPC")
         self._used_names = set()
+        # in big worlds, most names get used up and it's not worth trying as
+        # hard after that. names never come back, so once it's happened to
+        # several NPCs in a row, it stays that way
+        self._name_failures_in_a_row = 0
+        self._names_used_up = False
+        self._bus = bus
+
+        # where each NPC's own subscription goes in line. (None: at the back)
+        self._subject_order: Optional[int] = None
 
     def generate(self) -> NPCHandle:
         handle = NPCHandle(self._sym.gen())
-        self._all[handle] = NPC.generate(handle, self._used_names)
+        self._all[handle] = NPC.generate(
+            handle,
+            self._used_names,
+            NAME_TRIES_USED_UP if self._names_used_up else NAME_TRIES,
+        )
+        if self._all[handle].name in self._used_names:
+            self._name_failures_in_a_row += 1
+            if self._name_failures_in_a_row >= NAME_FAILURES_USED_UP:
+                self._names_used_up = True
+        else:
+            self._name_failures_in_a_row = 0
         self._used_names.add(self._all[handle].name)
+
+        # only notify npcs themselves when they get a flag
+        self._bus.subscribe(
+            [Verbs.AddFlag],
+            self._notify_subject,
+            npc=handle,
+            order=self._subject_order,
+        )
         return handle
 
+    def notify_subjects_at(self, order: int):
+        # NPCs generated from now on hear about their own flags at this place
+        # in line. (see EventBus.reserve_order)
+        self._subject_order = order
+
     def all(self) -> List[NPCHandle]:
         return list(self._all.keys())
 
@@ -34,22 +75,28 @@ class NPCs(object):
 
     def notify(self, world: "World", event: "Event"):
         # TODO: Notify npcs near the player more often?
+        # Only NPCs in the level can do anything, and for now only when the
+        # player is right next to them
+        if not world.level:
+            return
+
+        for npc in world.level.npcs_near(world.player_xy, NPC.NOTICE_DISTANCE):
+            self._notify_npc(world, npc, event)
+
+    def _notify_subject(self, world: "World", event: "Event"):
+        self._notify_npc(world, event.args[0], event)
+
+    def _notify_npc(self, world: "World", npc: NPCHandle, event: "Event"):
         from .world import World
 
         assert isinstance(world, World)
         assert isinstance(event, Event)
 
-        if event.verb == Verbs.AddFlag:
-            npcs = [event.args[0]]  # only notify npcs themselves when they get a flag
+        if world.level:
+            xy = world.level.npc_location(npc)
         else:
-            npcs = world.npcs.all()
-
-        for npc in npcs:
-            if world.level:
-                xy = world.level.npc_location(npc)
-            else:
-                xy = None
-            self.get(npc).notify(world, Me(me_xy=xy), event)
+            xy = None
+        self.get(npc).notify(world, Me(me_xy=xy), event)
 
 
 class Me(NamedTuple):
@@ -61,6 +108,9 @@ class Me(NamedTuple):
 
 
 class NPC(object):
+    # how close (manhattan) the player has to be for an NPC to react on a tick
+    NOTICE_DISTANCE = 1
+
     def __init__(self, ident, name):
         self._ident = ident
         self.name = name
@@ -73,11 +123,11 @@ class NPC(object):
         return self._ident
 
     @classmethod
-    def generate(cls, ident, used_names: Set[str]):
+    def generate(cls, ident, used_names: Set[str], name_tries: int = NAME_TRIES):
         # TODO: Name tools
         return NPC(
             ident=ident,
-            name=namegen.generate(used_names),
+            name=namegen.generate(used_names, name_tries),
         )
 
     def notify(self, world: "World", me: Me, event: Event):
@@ -93,7 +143,7 @@ class NPC(object):
         if not me.loaded:
             return
 
-        if world.player_xy.manhattan(me.me_xy) <= 1:
+        if world.player_xy.manhattan(me.me_xy) <= NPC.NOTICE_DISTANCE:
             # offer a quest
             # world.eventmonitors.add(world, lambda handle: TestQuest(handle, self._ident))
             world.eventmonitors.add(
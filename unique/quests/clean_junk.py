@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import FrozenSet, Optional
 
 from ..event import Event, Verbs
 from ..eventmonitor import Done, EMHandle, EventMonitor, QuestOutcome, QuestStatus
@@ -14,6 +14,9 @@ class CleanJunkQuest(EventMonitor):
         self._junk_left = self._initial_junk
         self._completed = False
 
+    def verbs(self) -> FrozenSet[str]:
+        return frozenset([Verbs.Tick])
+
     def notify(self, world: "World", event: "Event") -> Optional["Done"]:
         if event.verb == Verbs.Tick:
             self._junk_left = world.level.items.junk_left
@@ -1,11 +1,12 @@
 from enum import Enum
-from typing import Optional
+from typing import FrozenSet, Optional
 
 from ds.vecs import V2
 
 from ..event import Event, Verbs
 from ..eventmonitor import Done, EMHandle, EventMonitor, QuestOutcome, QuestStatus
 from ..inventory import ClaimHandle
+from ..item import Item
 from ..npc import NPCHandle
 from ..world import World
 
@@ -34,13 +35,25 @@ class FetchQuest(EventMonitor):
         else:
             return _FQState.Returned
 
+    def verbs(self) -> FrozenSet[str]:
+        return frozenset([Verbs.Claim, Verbs.Tick])
+
+    def claims_names(self) -> FrozenSet[str]:
+        return frozenset([self._item_name])
+
+    def would_claim(self, world: "World", item: "Item") -> bool:
+        return (
+            self._state() == _FQState.NotFetched
+            and item.profile.name == self._item_name
+        )
+
     def notify(self, world: "World", event: "Event") -> Optional["Done"]:
         # TODO: Unclaim verb
 
         if self._state() == _FQState.NotFetched:
             if event.verb == Verbs.Claim:
                 (box,) = event.args
-                if box.item.profile.name == self._item_name:
+                if self.would_claim(world, box.item):
                     self._claimed_item = box.claim(self._handle)
 
         elif self._state() == _FQState.NotReturned:
@@ -48,14 +61,13 @@ class FetchQuest(EventMonitor):
                 # inclusive box
                 xy0 = world.player_xy - V2.new(1, 1)
                 xy1 = world.player_xy + V2.new(1 + 1, 1 + 1)  # inclusive bottom
-                for xy in xy0.to(xy1):
-                    for npc in world.level.npc_sites.get_bs(xy):
-                        if npc == self._npc:
-                            self._returned = True
-                            world.inventory.claims.redeem(self._claimed_item)
-
-                            # TODO: Add to the NPC's inventory, if that's possible
-                            self._claimed_item = None  # get rid of old claim
+                npc_xy = world.level.npc_location(self._npc)
+                if npc_xy is not None and npc_xy in xy0.to(xy1):
+                    self._returned = True
+                    world.inventory.claims.redeem(self._claimed_item)
+
+                    # TODO: Add to the NPC's inventory, if that's possible
+                    self._claimed_item = None  # get rid of old claim
 
         return None
 
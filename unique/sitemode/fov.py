@@ -1,10 +1,17 @@
-from math import sqrt
-from typing import Callable, Dict, Optional
+from array import array
+from collections import OrderedDict
+from math import ceil, sqrt
+from typing import Callable, Container, Dict, Hashable, List, Optional, Tuple
 
 from ds.vecs import R2, V2
 
 # Port of Eben Howard's implementation:
 # http://www.roguebasin.com/index.php?title=FOV_using_recursive_shadowcasting_-_improved
+#
+# Reworked to run on a raster: walls come from a byte per tile over the view
+# rect, light goes into a float per tile over the same rect, and everything
+# about a cell that only depends on where it is relative to the viewer (slopes,
+# brightness) is computed once per radius and shared by all eight octants.
 
 
 def fov(
@@ -13,94 +20,276 @@ def fov(
     start_xy: V2,
     radius: float,
 ) -> "Lightmap":
-    fov = _FOV(has_wall, view_rect, start_xy, radius)
-    fov._light()
-    return Lightmap(fov._lightmap)
+    if view_rect is None:
+        reach = V2.new(ceil(radius), ceil(radius))
+        view_rect = (start_xy - reach).to(start_xy + reach + V2.new(1, 1))
+    return fov_opacity(Opacity.new(view_rect, has_wall), start_xy, radius)
+
+
+def fov_opacity(opacity: "Opacity", start_xy: V2, radius: float) -> "Lightmap":
+    assert isinstance(opacity, Opacity)
+    assert isinstance(start_xy, V2)
+    assert isinstance(radius, float)
+
+    rect = opacity.rect
+    light = array("d", [0.0]) * (rect.size.x * rect.size.y)
+    if rect.contains_xy(start_xy.x, start_xy.y):
+        light[opacity.index(start_xy.x, start_xy.y)] = 1.0
+
+    rays = _rays(radius)
+    for dx, dy in [(-1, -1), (-1, 1), (1, -1), (1, 1)]:
+        _cast_light(light, opacity, start_xy, radius, rays, 0, dx, dy, 0)
+        _cast_light(light, opacity, start_xy, radius, rays, dx, 0, 0, dy)
+    return Lightmap(rect, light)
+
+
+class Opacity(object):
+    # one byte per tile in rect, nonzero if the tile blocks sight
+    def __init__(self, rect: R2, opaque: bytearray):
+        assert isinstance(rect, R2)
+        assert len(opaque) == rect.size.x * rect.size.y
+
+        self.rect = rect
+        self.opaque = opaque
+
+    @classmethod
+    def new(cls, rect: R2, has_wall: Callable[[V2], bool]) -> "Opacity":
+        return Opacity(rect, bytearray(bool(has_wall(v)) for v in rect))
+
+    @classmethod
+    def from_blocks(cls, rect: R2, blocks: Container[V2]) -> "Opacity":
+        return Opacity(rect, bytearray(v in blocks for v in rect))
+
+    def index(self, x: int, y: int) -> int:
+        return (y - self.rect.top.y) * self.rect.size.x + (x - self.rect.top.x)
 
 
 class Lightmap(object):
-    def __init__(self, light_level: Dict[V2, float]):
+    def __init__(self, rect: R2, light_level: array):
+        assert isinstance(rect, R2)
+        assert len(light_level) == rect.size.x * rect.size.y
+
+        self._rect = rect
         self._light_level = light_level
+        self._lit: Optional[List[V2]] = None
+        self._lit_rows: Optional[Dict[int, int]] = None
+
+    @classmethod
+    def empty(cls) -> "Lightmap":
+        return Lightmap(R2.new(V2.zero(), V2.zero()), array("d"))
+
+    @property
+    def rect(self) -> R2:
+        return self._rect
 
     def __getitem__(self, v: V2) -> float:
         assert isinstance(v, V2)
-        return self._light_level.get(v, 0.0)
+        if not self._rect.contains_xy(v.x, v.y):
+            return 0.0
+        top, size = self._rect.top, self._rect.size
+        return self._light_level[(v.y - top.y) * size.x + (v.x - top.x)]
+
+    def lit(self) -> List[V2]:
+        # every tile with any light at all, in the same order as iterating rect
+        if self._lit is None:
+            self._lit = [
+                v for v, level in zip(self._rect, self._light_level) if level > 0
+            ]
+        return self._lit
+
+    def lit_rows(self) -> Dict[int, int]:
+        # the same tiles as lit(), as one mask per row: bit i is x == rect.top.x + i
+        if self._lit_rows is None:
+            self._lit_rows = {}
+            w = self._rect.size.x
+            for dy in range(self._rect.size.y):
+                mask = 0
+                for i, level in enumerate(self._light_level[dy * w : (dy + 1) * w]):
+                    if level > 0:
+                        mask |= 1 << i
+                if mask:
+                    self._lit_rows[self._rect.top.y + dy] = mask
+        return self._lit_rows
+
 
+class FOVCache(object):
+    # Lightmaps for the last few places we looked from. level_key identifies
+    # the level's geometry (sitemode passes the level's ident: the walls of a
+    # loaded level never change)
+    def __init__(self, max_lightmaps: int = 16):
+        self._max_lightmaps = max_lightmaps
+        self._lightmaps: "OrderedDict[Hashable, Lightmap]" = OrderedDict()
 
-class _FOV(object):
-    def __init__(
+        self._opacity_key: Optional[Hashable] = None
+        self._opacity: Optional[Opacity] = None
+
+    def fov(
         self,
-        has_wall: Callable[[V2], bool],
-        view_rect: Optional[R2],
+        level_key: Hashable,
+        blocks: Container[V2],
+        view_rect: R2,
         start_xy: V2,
         radius: float,
-    ):
-        assert view_rect is None or isinstance(view_rect, R2)
-        assert isinstance(start_xy, V2)
-        assert isinstance(radius, float)
-
-        self._has_wall: Callable[[V2], bool] = has_wall
-        self._view_rect = view_rect
-        self._start_xy = start_xy
+    ) -> Lightmap:
+        key = (level_key, view_rect, start_xy, radius)
+        lightmap = self._lightmaps.get(key)
+        if lightmap is not None:
+            self._lightmaps.move_to_end(key)
+            return lightmap
+
+        # the view rect only moves when the camera does, so this is often reusable
+        opacity_key = (level_key, view_rect)
+        if opacity_key != self._opacity_key:
+            self._opacity = Opacity.from_blocks(view_rect, blocks)
+            self._opacity_key = opacity_key
+
+        lightmap = fov_opacity(self._opacity, start_xy, radius)
+        self._lightmaps[key] = lightmap
+        while len(self._lightmaps) > self._max_lightmaps:
+            self._lightmaps.popitem(last=False)
+        return lightmap
+
+
+class _Row(object):
+    # cells at one distance from the viewer, indexed by delta_x + distance
+    def __init__(self, distance: int, radius: float):
+        delta_y = -distance
+        self.left_slopes: List[float] = []
+        self.right_slopes: List[float] = []
+        self.brightness: List[Optional[float]] = []
+
+        for delta_x in range(-distance, 0 + 1):
+            self.left_slopes.append((delta_x - 0.5) / (delta_y + 0.5))
+            self.right_slopes.append((delta_x + 0.5) / (delta_y - 0.5))
+
+            r = sqrt(delta_x**2 + delta_y**2)
+            self.brightness.append(float(1 - (r / radius)) if r <= radius else None)
+
+
+class _Rays(object):
+    def __init__(self, radius: float):
         self._radius = radius
-        self._lightmap = {}
+        self._rows: List[_Row] = []
+
+    def row(self, distance: int) -> _Row:
+        while len(self._rows) <= distance:
+            self._rows.append(_Row(len(self._rows), self._radius))
+        return self._rows[distance]
+
+
+_RAYS: Dict[float, _Rays] = {}
+
+
+def _rays(radius: float) -> _Rays:
+    rays = _RAYS.get(radius)
+    if rays is None:
+        rays = _RAYS[radius] = _Rays(radius)
+    return rays
+
+
+def _in_range(
+    s: int, k: int, lo: int, hi: int, distance: int
+) -> Tuple[Optional[int], Optional[int]]:
+    # delta_x values in [-distance, 0] such that lo <= s + delta_x * k < hi
+    # (as offsets from -distance, for indexing a _Row)
+    if k == 1:
+        dx0, dx1 = lo - s, hi - 1 - s
+    else:
+        dx0, dx1 = s - hi + 1, s - lo
+    dx0, dx1 = max(dx0, -distance), min(dx1, 0)
+    if dx0 > dx1:
+        return None, None
+    return dx0 + distance, dx1 + distance
 
-    def _light(self):
-        self._lightmap[self._start_xy] = 1.0
-        for dx, dy in [(-1, -1), (-1, 1), (1, -1), (1, 1)]:
-            self._cast_light(1, 1.0, 0.0, 0, dx, dy, 0)
-            self._cast_light(1, 1.0, 0.0, dx, 0, 0, dy)
 
-    def _cast_light(
-        self, row: int, start: float, end: float, xx: int, xy: int, yx: int, yy: int
-    ):
+def _cast_light(
+    light: array,
+    opacity: Opacity,
+    start_xy: V2,
+    radius: float,
+    rays: _Rays,
+    xx: int,
+    xy: int,
+    yx: int,
+    yy: int,
+):
+    # For the cell at (delta_x, -distance) in this octant:
+    #   x = sx + delta_x * xx - distance * xy
+    #   y = sy + delta_x * yx - distance * yy
+    # One of those only depends on distance ("row") and the other only on
+    # delta_x ("col"). Rows wholly outside the view rect have nothing to light
+    # and no walls, so skip them. Likewise for cells outside it within a row.
+    rect, opaque = opacity.rect, opacity.opaque
+    sx, sy = start_xy
+    x0, y0 = rect.top
+    w, h = rect.size
+
+    if xx == 0:
+        row_s, row_k, row_lo, row_hi = sx, xy, x0, x0 + w
+        col_s, col_k, col_lo, col_hi = sy, yx, y0, y0 + h
+    else:
+        row_s, row_k, row_lo, row_hi = sy, yy, y0, y0 + h
+        col_s, col_k, col_lo, col_hi = sx, xx, x0, x0 + w
+
+    # distances whose row is in the rect: row_lo <= row_s - distance * row_k < row_hi
+    if row_k == 1:
+        min_distance, max_distance = row_s - row_hi + 1, row_s - row_lo
+    else:
+        min_distance, max_distance = row_lo - row_s, row_hi - 1 - row_s
+    max_distance = min(max_distance, int(radius))
+
+    step = yx * w + xx
+
+    # the recursive calls of the original, as a stack: each call's result
+    # doesn't depend on anything done after it's made, so order doesn't matter
+    pending = [(1, 1.0, 0.0)]
+    while pending:
+        row, start, end = pending.pop()
         new_start = 0.0
         if start < end:
-            return
+            continue
 
         blocked = False
-        distance = row - 1
-        while True:
-            distance += 1
-            if distance > self._radius:
-                break
+        for distance in range(max(row, min_distance), max_distance + 1):
             if blocked:
                 break
 
-            delta_y = -distance
-            for delta_x in range(-distance, 0 + 1):
-                current_x = self._start_xy.x + delta_x * xx + delta_y * xy
-                current_y = self._start_xy.y + delta_x * yx + delta_y * yy
-                current = V2.new(current_x, current_y)
-                left_slope = (delta_x - 0.5) / (delta_y + 0.5)
-                right_slope = (delta_x + 0.5) / (delta_y - 0.5)
-
-                if (
-                    self._view_rect and current not in self._view_rect
-                ) or start < right_slope:
+            i0, i1 = _in_range(col_s, col_k, col_lo, col_hi, distance)
+            if i0 is None:
+                continue
+
+            ray_row = rays.row(distance)
+            left_slopes = ray_row.left_slopes
+            right_slopes = ray_row.right_slopes
+            brightness = ray_row.brightness
+            base = (
+                (sy - distance * yy - y0) * w
+                + (sx - distance * xy - x0)
+                - distance * step
+            )
+
+            for i in range(i0, i1 + 1):
+                right_slope = right_slopes[i]
+                if start < right_slope:
                     continue
-                elif end > left_slope:
+                left_slope = left_slopes[i]
+                if end > left_slope:
                     break
 
-                if self._r_strat(delta_x, delta_y) <= self._radius:
-                    bright = float(1 - (self._r_strat(delta_x, delta_y) / self._radius))
-                    self._lightmap[current] = bright
+                ix = base + i * step
+                bright = brightness[i]
+                if bright is not None:
+                    light[ix] = bright
 
                 if blocked:
-                    if self._has_wall(current):
+                    if opaque[ix]:
                         new_start = right_slope
                         continue
                     else:
                         blocked = False
                         start = new_start
                 else:
-                    if self._has_wall(current) and distance < self._radius:
+                    if opaque[ix] and distance < radius:
                         blocked = True
-                        self._cast_light(
-                            distance + 1, start, left_slope, xx, xy, yx, yy
-                        )
+                        pending.append((distance + 1, start, left_slope))
                         new_start = right_slope
-
-    def _r_strat(self, dx: float, dy: float):
-        #  TODO: Use squared distances only?
-        return sqrt(dx ** 2 + dy ** 2)
@@ -54,10 +54,11 @@ class ShopScreen(object):
         if enterprise:
             restaurant = self.world.enterprises.get_restaurant(self.world, enterprise)
             if restaurant:
+                who_wants = self.world.eventmonitors.who_wants_all(
+                    self.world, restaurant.menu.items
+                )
                 all_items.extend(
-                    ItemToBuy(
-                        item, 0, self.world.eventmonitors.who_wants(self.world, item)
-                    )
+                    ItemToBuy(item, 0, who_wants.get(item))
                     for item in restaurant.menu.items
                 )
                 verbs.append("Order")
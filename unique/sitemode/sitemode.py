@@ -13,6 +13,7 @@ from ..world import World
 from . import fly_screen, fov, inventory_screen, shop_screen
 from .npcview import NPCView
 from .targeter import Target, Targeter
+from .tile_cache import TileCache
 from .window import Window, draw_window
 
 
@@ -33,7 +34,9 @@ class Sitemode(object):
         self.io = io
         self.world = world
         self.targets = Targeter()
-        self.lightmap: fov.Lightmap = fov.Lightmap({})
+        self.lightmap: fov.Lightmap = fov.Lightmap.empty()
+        self.fov_cache = fov.FOVCache()
+        self.tile_cache = TileCache(self.draw_wallpaper, self.draw_ceiling)
         self.npc_view = NPCView(self.world)
 
     @property
@@ -144,23 +147,24 @@ class Sitemode(object):
                 self.world.tick()
 
     def recalculate_visibility(self):
-        self.lightmap = fov.fov(
-            lambda world_xy: world_xy in self.world.level.blocks,
+        level = self.world.level
+        self.lightmap = self.fov_cache.fov(
+            level.ident,  # level geometry never changes once it's loaded
+            level.blocks,
             self.camera_world_rect,
             self.world.player_xy,
             80.0,  # see indefinitely in all directions
         )
-        self.world.level.seen.update(
-            world_xy
-            for world_xy in self.camera_world_rect
-            if self.lightmap[world_xy] > 0
-        )
+        level.seen.or_rows(self.lightmap.rect.top.x, self.lightmap.lit_rows())
         # TODO: Player always sees NPCs who they are Friend/Love with
+        # (there are far fewer NPCs than tiles, so start from the NPCs)
         possible_targets = [
             Target(npc, world_xy)
-            for world_xy in self.camera_world_rect
-            if self.lightmap[world_xy] > 0
-            for npc in self.world.level.npc_sites.get_bs(world_xy)
+            for world_xy in sorted(
+                (xy for xy in level.npc_sites.all_as() if self.lightmap[xy] > 0),
+                key=lambda xy: (xy.y, xy.x),
+            )
+            for npc in level.npc_sites.get_bs(world_xy)
         ]
 
         for tar in possible_targets:
@@ -189,16 +193,26 @@ class Sitemode(object):
         # draw grid
         draw_world = self.io.draw().goto(0, 0).box(VIEW.x, VIEW.y).zeroed()
 
-        draw_world.bg(Colors.TermBG).fg(Colors.TermFG).fillc(" ")  # base color
-
         viewport_xys = (
             V2.new(x, y) for y in range(VIEW.y) for x in range(0, VIEW.x, 2)
         )
 
+        level = self.world.level
+        player_xy = self.world.player_xy
+
+        # Every layer of a tile covers both of its cells, so whichever layer
+        # is drawn last is the only one that shows. The static layers come out
+        # of self.tile_cache as finished cells and get written a row at a time.
+        # Tiles with items, NPCs or the player on top are drawn afterwards.
+        rows = [[] for y in range(VIEW.y)]
+        things_to_draw = []
+
         tooltip_xy = None
         tooltip_lst = []
         for world_xy_bot, viewport_xy in zip(self.camera_world_rect, viewport_xys):
             world_xy_back = world_xy_bot + V2.new(0, -1)
+            layers = self.tile_cache.get(level, world_xy_bot)
+            lit = self.lightmap[world_xy_bot] > 0
 
             # Draw order:
             # (1) Back of block behind
@@ -206,103 +220,53 @@ class Sitemode(object):
             # (3) Top of this block
             # (4) Tooltips
 
-            draw_tile = (
-                draw_world.goto(viewport_xy).bg(Colors.WorldBG).fg(Colors.WorldFG)
-            )
-            draw_tile.copy().putdw(DoubleWide.Blank)
-
-            if self.lightmap[world_xy_bot] == 0:
-                draw_tile.copy().bg(Colors.WorldUnseenBG).fg(
-                    Colors.WorldUnseenFG
-                ).putdw(DoubleWide.Blank)
+            cells = self.tile_cache.blank_lit if lit else self.tile_cache.blank_unlit
 
             # == Back of block behind ==
-            if world_xy_back in self.world.level.seen:
-                back = self.world.level.blocks.get(world_xy_back)
-            else:
-                back = None
-
-            if world_xy_bot in self.world.level.seen:
-                top = self.world.level.blocks.get(world_xy_bot)
-            else:
-                top = None
-
-            if back == Block.Normal:
-                self.draw_wallpaper(
-                    draw_tile.copy(),
-                    self.world.level.wallpaper.get(world_xy_back),
-                    cutaway=False,
-                    illum=self.lightmap[world_xy_back] > 0
-                    and self.world.player_xy.y > world_xy_back.y,
-                )
-
-            if self.lightmap[world_xy_bot] > 0:
-                things_drawn = 0
-                for spawn in self.world.level.items.view(world_xy_bot):
-                    dt = draw_tile.copy()
-                    profile = spawn.item.profile
-
-                    if things_drawn > 0:
-                        dt.bg(Colors.Grey0)
-                    if profile.bg is not None:
-                        dt.bg(profile.bg)
-                    if profile.fg is not None:
-                        dt.fg(profile.fg)
-
-                    if profile.double_icon is not None:
-                        if isinstance(profile.double_icon, str):
-                            dt.goto(viewport_xy).puts(profile.double_icon, wrap=False)
-                        else:
-                            dt.goto(viewport_xy).putdw(profile.double_icon)
-                    else:
-                        dt.goto(viewport_xy + V2(1, 0)).puts(profile.icon)
-                        (resource_fg, resource_icon) = spawn.item.contributions[
-                            0
-                        ].resource.display()
-                        dt.goto(viewport_xy).fg(resource_fg).puts(resource_icon)
+            if layers.back_lit is not None and world_xy_back in level.seen:
+                if self.lightmap[world_xy_back] > 0 and player_xy.y > world_xy_back.y:
+                    cells = layers.back_lit
+                else:
+                    cells = layers.back_unlit
 
-                    things_drawn += 1
+            has_top = layers.top_lit is not None and world_xy_bot in level.seen
 
-                    if world_xy_bot == self.world.player_xy:
+            if lit:
+                if level.items.has_any(world_xy_bot):
+                    spawns = level.items.view(world_xy_bot)
+                else:
+                    spawns = []
+                if world_xy_bot == player_xy:
+                    for spawn in spawns:
                         tooltip_xy = viewport_xy + V2(0, 1)
-                        tooltip_lst.append(profile.name)
-
-                npc: NPCHandle
-                for npc in self.world.level.npc_sites.get_bs(world_xy_bot):
-                    interest = self.world.interest[npc]
-                    # npc_sites
-                    if npc == self.targets.target:
-                        draw_tile.copy().bg(interest.color()).fg(Colors.WorldBG).putdw(
-                            DoubleWide.At
-                        )
-                    else:
-                        draw_tile.copy().bg(
-                            Colors.WorldBG if things_drawn == 0 else Colors.Grey0
-                        ).fg(interest.color()).putdw(DoubleWide.At)
-                    things_drawn += 1
+                        tooltip_lst.append(spawn.item.profile.name)
 
-                if world_xy_bot == self.world.player_xy:
-                    draw_tile.copy().bg(
-                        Colors.WorldBG if things_drawn == 0 else Colors.Grey0
-                    ).fg(Colors.Player).putdw(DoubleWide.Bat)
+                if not has_top and (
+                    spawns
+                    or level.npc_sites.count_bs(world_xy_bot)
+                    or world_xy_bot == player_xy
+                ):
+                    things_to_draw.append((world_xy_bot, viewport_xy, spawns))
 
             # if this is right above a wall, draw a (seen) ceiling
-            if top == Block.Normal:
-                self.draw_ceiling(
-                    draw_tile.copy(),
-                    self.world.level.wallpaper.default,
-                    # self.world.level.wallpaper.get(world_xy + V2.new(0, 1)),
-                    cutaway=False,
-                    illum=self.lightmap[world_xy_bot] > 0,
-                )
-
-            elif top == Block.Exit:
-                if self.lightmap[world_xy_bot] > 0:
-                    draw_tile.copy().putdw(DoubleWide.Exit)
-                else:
-                    draw_tile.copy().bg(Colors.WorldUnseenBG).fg(
-                        Colors.WorldUnseenFG
-                    ).putdw(DoubleWide.Exit)
+            if has_top:
+                cells = layers.top_lit if lit else layers.top_unlit
+
+            rows[viewport_xy.y].extend(cells)
+
+        for y, row in enumerate(rows):
+            draw_world.copy().goto(0, y).putcells(row)
+
+        for world_xy_bot, viewport_xy, spawns in things_to_draw:
+            self.draw_things(
+                draw_world.copy()
+                .goto(viewport_xy)
+                .bg(Colors.WorldBG)
+                .fg(Colors.WorldFG),
+                world_xy_bot,
+                viewport_xy,
+                spawns,
+            )
 
         # Draw tooltips
         if tooltip_xy is not None and tooltip_lst:
@@ -312,6 +276,52 @@ class Sitemode(object):
                     Colors.TermFGBold
                 ).puts(tip)
 
+    def draw_things(self, draw_tile, world_xy_bot, viewport_xy, spawns):
+        things_drawn = 0
+        for spawn in spawns:
+            dt = draw_tile.copy()
+            profile = spawn.item.profile
+
+            if things_drawn > 0:
+                dt.bg(Colors.Grey0)
+            if profile.bg is not None:
+                dt.bg(profile.bg)
+            if profile.fg is not None:
+                dt.fg(profile.fg)
+
+            if profile.double_icon is not None:
+                if isinstance(profile.double_icon, str):
+                    dt.goto(viewport_xy).puts(profile.double_icon, wrap=False)
+                else:
+                    dt.goto(viewport_xy).putdw(profile.double_icon)
+            else:
+                dt.goto(viewport_xy + V2(1, 0)).puts(profile.icon)
+                (resource_fg, resource_icon) = spawn.item.contributions[
+                    0
+                ].resource.display()
+                dt.goto(viewport_xy).fg(resource_fg).puts(resource_icon)
+
+            things_drawn += 1
+
+        npc: NPCHandle
+        for npc in self.world.level.npc_sites.get_bs(world_xy_bot):
+            interest = self.world.interest[npc]
+            # npc_sites
+            if npc == self.targets.target:
+                draw_tile.copy().bg(interest.color()).fg(Colors.WorldBG).putdw(
+                    DoubleWide.At
+                )
+            else:
+                draw_tile.copy().bg(
+                    Colors.WorldBG if things_drawn == 0 else Colors.Grey0
+                ).fg(interest.color()).putdw(DoubleWide.At)
+            things_drawn += 1
+
+        if world_xy_bot == self.world.player_xy:
+            draw_tile.copy().bg(
+                Colors.WorldBG if things_drawn == 0 else Colors.Grey0
+            ).fg(Colors.Player).putdw(DoubleWide.Bat)
+
     def draw_targeted_user(self):
         self.npc_view.draw(self.io.draw())
 
@@ -0,0 +1,87 @@
+from typing import Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from display import Colors, DoubleWide, Drawer, Screen
+from display.screen import Cell
+from ds.vecs import V2
+
+from ..level import Block, LoadedLevel, WallTile
+
+# the two cells of one tile, left to right
+TileCells = Tuple[Cell, Cell]
+
+
+class TileLayers(NamedTuple):
+    # the parts of a tile that only depend on level geometry, already drawn
+    # (lit and unlit versions, or None if there is no such layer)
+    back_lit: Optional[TileCells]  # back of the block behind this one
+    back_unlit: Optional[TileCells]
+    top_lit: Optional[TileCells]  # ceiling or exit on this one
+    top_unlit: Optional[TileCells]
+
+
+class TileCache(object):
+    def __init__(
+        self,
+        draw_wallpaper: Callable[[Drawer, WallTile, bool, bool], None],
+        draw_ceiling: Callable[[Drawer, WallTile, bool, bool], None],
+    ):
+        self._draw_wallpaper = draw_wallpaper
+        self._draw_ceiling = draw_ceiling
+
+        self._key: Optional[Hashable] = None
+        self._layers: Dict[V2, TileLayers] = {}
+
+        self.blank_lit = _render(lambda d: d.putdw(DoubleWide.Blank))
+        self.blank_unlit = _render(
+            lambda d: d.bg(Colors.WorldUnseenBG)
+            .fg(Colors.WorldUnseenFG)
+            .putdw(DoubleWide.Blank)
+        )
+
+    def get(self, level: LoadedLevel, world_xy: V2) -> TileLayers:
+        # level geometry never changes once it's loaded, so only a new level
+        # throws the tiles out
+        if level.ident != self._key:
+            self._key = level.ident
+            self._layers = {}
+
+        layers = self._layers.get(world_xy)
+        if layers is None:
+            layers = self._layers[world_xy] = self._build(level, world_xy)
+        return layers
+
+    def _build(self, level: LoadedLevel, world_xy: V2) -> TileLayers:
+        world_xy_back = world_xy + V2.new(0, -1)
+
+        back_lit = back_unlit = None
+        if level.blocks.get(world_xy_back) == Block.Normal:
+            walltile = level.wallpaper.get(world_xy_back)
+            back_lit, back_unlit = [
+                _render(lambda d: self._draw_wallpaper(d, walltile, False, illum))
+                for illum in [True, False]
+            ]
+
+        top_lit = top_unlit = None
+        top = level.blocks.get(world_xy)
+        if top == Block.Normal:
+            walltile = level.wallpaper.default
+            top_lit, top_unlit = [
+                _render(lambda d: self._draw_ceiling(d, walltile, False, illum))
+                for illum in [True, False]
+            ]
+        elif top == Block.Exit:
+            top_lit = _render(lambda d: d.putdw(DoubleWide.Exit))
+            top_unlit = _render(
+                lambda d: d.bg(Colors.WorldUnseenBG)
+                .fg(Colors.WorldUnseenFG)
+                .putdw(DoubleWide.Exit)
+            )
+
+        return TileLayers(back_lit, back_unlit, top_lit, top_unlit)
+
+
+def _render(draw: Callable[[Drawer], None]) -> TileCells:
+    # draw a tile the ordinary way, onto a screen just big enough for it
+    screen = Screen(V2.new(2, 1))
+    draw(screen.draw().bg(Colors.WorldBG).fg(Colors.WorldFG))
+    return screen[V2.new(0, 0)], screen[V2.new(1, 0)]
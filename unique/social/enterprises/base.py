@@ -98,6 +98,10 @@ class Enterprises(object):
         self._works: OneToMany[NPCHandle, ShiftHandle] = OneToMany()
         self._located_at: OneToOne[EnterpriseHandle, LevelHandle] = OneToOne()
 
+        # time of day -> employee -> their shifts active then. (Cleared when
+        # anyone's hired or fired)
+        self._active_shifts: Dict["TimeOfDay", Dict[NPCHandle, List[ShiftHandle]]] = {}
+
     def generate(self, world: "World", zone_type: ZoneType) -> EnterpriseHandle:
         from ...world import World
 
@@ -152,11 +156,13 @@ class Enterprises(object):
         assert isinstance(shift, ShiftHandle)
         assert isinstance(npc, NPCHandle)
         self._works.add(npc, shift)
+        self._active_shifts.clear()
 
     def unemploy(self, shift: ShiftHandle, npc: NPCHandle):
         assert isinstance(shift, ShiftHandle)
         assert isinstance(npc, NPCHandle)
         self._works.remove(npc, shift)
+        self._active_shifts.clear()
 
     def get_employees(self, enterprise: EnterpriseHandle) -> Iterator[NPCHandle]:
         assert isinstance(enterprise, EnterpriseHandle)
@@ -174,6 +180,19 @@ class Enterprises(object):
         for shift in self._works.get_bs(npc):
             yield shift
 
+    def get_active_shifts(
+        self, time_of_day: "TimeOfDay"
+    ) -> Dict[NPCHandle, List[ShiftHandle]]:
+        # everyone with a shift at time_of_day, and those shifts: the same as
+        # asking get_shifts_worked_by about every NPC, but only once per time
+        table = self._active_shifts.get(time_of_day)
+        if table is None:
+            table = self._active_shifts[time_of_day] = {}
+            for npc, shift in self._works.all():
+                if self.get_shift(shift).active_at(time_of_day):
+                    table.setdefault(npc, []).append(shift)
+        return table
+
     def all_shifts_of(self, enterprise: EnterpriseHandle):
         assert isinstance(enterprise, EnterpriseHandle)
         for shift in self._all[enterprise].all_shifts():
@@ -1,5 +1,7 @@
+import heapq
 import random
-from typing import Dict, List, Optional
+from itertools import compress
+from typing import Dict, List, Optional, Set, Tuple
 
 from ds.relational import OneToMany
 
@@ -13,10 +15,30 @@ from .time_of_day import TimeOfDay
 class Schedule(object):
     def __init__(self):
         self._items: Dict[NPCHandle, ScheduleItem] = {}
-        self._calculated_location: Dict[NPCHandle, LevelHandle] = {}
-        self._calculated_location_determines: OneToMany[
-            NPCHandle, NPCHandle
-        ] = OneToMany()
+
+        # leader -> everyone whose schedule item says to follow them
+        self._follows: OneToMany[NPCHandle, NPCHandle] = OneToMany()
+
+        # level -> everyone we've worked out is going there
+        self._calculated_location: OneToMany[LevelHandle, NPCHandle] = OneToMany()
+
+        # everyone with a schedule item whose location isn't worked out yet
+        self._unresolved: Dict[NPCHandle, None] = {}
+
+    @classmethod
+    def new(cls, items: Dict[NPCHandle, ScheduleItem]) -> "Schedule":
+        # the same as assigning each item in turn, for a fresh schedule
+        schedule = cls()
+        for npch, schedule_item in items.items():
+            assert isinstance(npch, NPCHandle)
+            assert isinstance(schedule_item, ScheduleItem)
+
+            leader = _leader(schedule_item)
+            if leader is not None:
+                schedule._follows.add(leader, npch)
+        schedule._items = dict(items)
+        schedule._unresolved = dict.fromkeys(items)
+        return schedule
 
     def __getitem__(self, npch: NPCHandle) -> ScheduleItem:
         assert isinstance(npch, NPCHandle)
@@ -28,73 +50,117 @@ class Schedule(object):
         del self[npch]
 
         self._items[npch] = schedule_item
+        self._unresolved[npch] = None
+
+        leader = _leader(schedule_item)
+        if leader is not None:
+            self._follows.add(leader, npch)
 
     def __delitem__(self, npch: NPCHandle):
         assert isinstance(npch, NPCHandle)
+        self._follows.remove_b(npch)
+        self.clear_location(npch)
+
         if npch in self._items:
             del self._items[npch]
-
-        self.clear_location(npch)
+            del self._unresolved[npch]
 
     def get_location(self, world: "World", npch: NPCHandle) -> "LevelHandle":
-        return self._get_location(world, npch, [])
+        assert isinstance(npch, NPCHandle)
+
+        level = self._calculated_location.get_a(npch)
+        if level is None:
+            self._resolve(world, npch)
+            level = self._calculated_location.get_a(npch)
+        return level
 
-    def _get_location(
-        self, world: "World", npch: NPCHandle, breadcrumbs: List[NPCHandle]
-    ) -> "LevelHandle":
+    def npcs_at(self, world: "World", level: "LevelHandle") -> List[NPCHandle]:
+        from ..worldmap import LevelHandle
+
+        assert isinstance(level, LevelHandle)
+
+        # the index is built the first time anyone asks, then kept up to date
+        # by only working out the locations of people whose schedules changed
+        self.resolve_all(world)
+        return sorted(self._calculated_location.get_bs(level))
+
+    def resolve_all(self, world: "World"):
+        # in handle order, so levels get looked up in the same order as when
+        # each NPC was asked about separately
+        for npch in sorted(self._unresolved):
+            if npch in self._unresolved:
+                self._resolve(world, npch)
+
+    def _resolve(self, world: "World", npch: NPCHandle):
+        # Work out where npch is going, and where everyone it's following
+        # (directly or not) is going while we're at it.
+        #
+        # Follow loops (A follows B, B follows A) have nowhere to go, so:
+        #  - everyone in the loop goes to their own home
+        #  - anyone who follows their way into the loop from outside goes
+        #    wherever the member they reach first is going: that member's home
+        # (which is what walking each NPC's chain separately, until it comes
+        # back to someone it's already passed, gives)
         from ..world import World
 
         assert isinstance(world, World)
-        assert isinstance(npch, NPCHandle)
-        assert isinstance(breadcrumbs, list)
 
-        def recurse(onto):
-            breadcrumbs.append(npch)
-            res = self._get_location(world, onto, breadcrumbs)
-            breadcrumbs.pop()
-            return res
+        # people who go wherever the next person in chain goes
+        chain: List[NPCHandle] = []
+        chain_ix: Dict[NPCHandle, int] = {}
 
-        schedule_item: ScheduleItem = self[npch]
+        at = npch
+        while True:
+            level = self._calculated_location.get_a(at)
+            if level is not None:
+                break
 
-        if npch in self._calculated_location:
-            return self._calculated_location[npch]
+            if at in chain_ix:
+                loop = chain[chain_ix[at] :]
+                del chain[chain_ix[at] :]
+                for member in loop:
+                    self._remember(self._home(world, member), member)
+                level = self._calculated_location.get_a(at)
+                break
 
-        dependency = None
-        if npch in breadcrumbs:
-            result = world.households.get_home(
-                world, world.households.household_of(npch)
-            )
+            leader = self._follows.get_a(at)
+            if leader is None:
+                level = self._destination(world, at)
+                self._remember(level, at)
+                break
 
-        else:
-            rule = SCHEDULE_ITEMS.get(schedule_item.name).destination_rule
-            if rule == DestinationRule.MyHousehold:
-                result = world.households.get_home(
-                    world, world.households.household_of(npch)
-                )
-            elif rule == DestinationRule.Follow:
-                from ..social import EnterpriseHandle
-                from ..worldmap import LevelHandle
-
-                if isinstance(schedule_item.arg, NPCHandle):
-                    result = recurse(schedule_item.arg)
-                    dependency = npch
-                elif isinstance(schedule_item.arg, EnterpriseHandle):
-                    result = world.enterprises.get_site(world, schedule_item.arg)
-                elif isinstance(schedule_item.arg, LevelHandle):
-                    result = schedule_item.arg
-                else:
-                    raise AssertionError(
-                        "don't know how to follow: {}", schedule_item.arg
-                    )
-            else:
-                raise AssertionError("unrecognized rule: {}".format(rule))
+            chain_ix[at] = len(chain)
+            chain.append(at)
+            at = leader
+
+        for follower in chain:
+            self._remember(level, follower)
 
-        self._calculated_location[result] = result
-        if dependency:
-            self._calculated_location_determines.add(dependency, npch)
+    def _remember(self, level: "LevelHandle", npch: NPCHandle):
+        self._calculated_location.add(level, npch)
+        self._unresolved.pop(npch, None)
+
+    def _destination(self, world: "World", npch: NPCHandle) -> "LevelHandle":
+        # where npch is going, if it isn't following another NPC
+        from ..social import EnterpriseHandle
+        from ..worldmap import LevelHandle
+
+        schedule_item: ScheduleItem = self[npch]
+        rule = SCHEDULE_ITEMS.get(schedule_item.name).destination_rule
+        if rule == DestinationRule.MyHousehold:
+            return self._home(world, npch)
+        elif rule == DestinationRule.Follow:
+            if isinstance(schedule_item.arg, EnterpriseHandle):
+                return world.enterprises.get_site(world, schedule_item.arg)
+            elif isinstance(schedule_item.arg, LevelHandle):
+                return schedule_item.arg
+            else:
+                raise AssertionError("don't know how to follow: {}", schedule_item.arg)
         else:
-            self._calculated_location_determines.remove_b(npch)
-        return result
+            raise AssertionError("unrecognized rule: {}".format(rule))
+
+    def _home(self, world: "World", npch: NPCHandle) -> "LevelHandle":
+        return world.households.get_home(world, world.households.household_of(npch))
 
     def set_location(self, npch: NPCHandle, level_handle: "LevelHandle"):
         from ..worldmap import LevelHandle
@@ -102,17 +168,30 @@ class Schedule(object):
         assert isinstance(npch, NPCHandle)
         assert isinstance(level_handle, LevelHandle)
         self.clear_location(npch)
-        self._calculated_location[npch] = level_handle
+        self._remember(level_handle, npch)
 
     def clear_location(self, npch: NPCHandle):
+        # forget where npch is going, and where anyone who follows them is
         assert isinstance(npch, NPCHandle)
-        if npch in self._calculated_location:
-            del self._calculated_location[npch]
 
-        dependers = list(self._calculated_location_determines.get_bs(npch))
-        self._calculated_location_determines.remove_a(npch)
-        for depender in dependers:
-            self.clear_location(depender)
+        to_clear = [npch]
+        while to_clear:
+            clearing = to_clear.pop()
+            self._calculated_location.remove_b(clearing)
+            if clearing in self._items:
+                self._unresolved[clearing] = None
+
+            for follower in self._follows.get_bs(clearing):
+                if self._calculated_location.get_a(follower) is not None:
+                    to_clear.append(follower)
+
+
+def _leader(schedule_item: ScheduleItem) -> Optional[NPCHandle]:
+    # the NPC whose location determines this one, if any
+    rule = SCHEDULE_ITEMS.get(schedule_item.name).destination_rule
+    if rule == DestinationRule.Follow and isinstance(schedule_item.arg, NPCHandle):
+        return schedule_item.arg
+    return None
 
 
 class Schedules(object):
@@ -136,72 +215,104 @@ class Schedules(object):
         assert isinstance(npch, NPCHandle)
         return self._next_schedule.get_location(world, npch)
 
+    def npcs_at(self, world: "World", level: "LevelHandle") -> List[NPCHandle]:
+        from ..world import World
+
+        assert isinstance(world, World)
+        return self._next_schedule.npcs_at(world, level)
+
     def calculate_schedules(self, world: "World", time_of_day: TimeOfDay):
         from ..world import World
 
         assert isinstance(world, World)
         assert isinstance(time_of_day, TimeOfDay)
 
-        next_schedule = Schedule()
+        next_items: Dict[NPCHandle, ScheduleItem] = {}
+
+        # in handle order, so that the plan only depends on the random seed
+        all_npcs = sorted(world.npcs.all())
 
-        # emergencies
-        all_npcs = set(world.npcs.all())
-        no_emergency = set()
+        # everyone's needs and shifts at once, rather than one NPC at a time
+        world.rhythms.track(all_npcs)
+        rhythm_npcs = world.rhythms.npcs()
+        very_sleepy = set(compress(rhythm_npcs, world.rhythms.mask_very_sleepy()))
+        can_sleep = set(compress(rhythm_npcs, world.rhythms.mask_can_sleep()))
+        shifts_now = world.enterprises.get_active_shifts(time_of_day)
+
+        up_for_fun: Dict[NPCHandle, None] = {}
         for npc in all_npcs:
-            if world.rhythms.is_very_sleepy(npc):
-                next_schedule[npc] = schedule_items.HomeSleep
-            else:
-                no_emergency.add(npc)
-
-        # otherwise, try to go to work
-        not_busy = set()
-        for npc in no_emergency:
-            shifts_now = [
-                shift
-                for shift in world.enterprises.get_shifts_worked_by(npc)
-                if world.enterprises.get_shift(shift).active_at(time_of_day)
-            ]
-            if not shifts_now:
-                not_busy.add(npc)
-                continue
-
-            go_to = random.choice(shifts_now)
-            next_schedule[npc] = schedule_items.GoToWork(go_to.enterprise)
-
-        # otherwise, find something to do
-        up_for_fun = set()
-        for npc in not_busy:
-            sleepy = world.rhythms.can_sleep(npc)
-            if sleepy:
-                next_schedule[npc] = schedule_items.HomeSleep
-            else:
-                next_schedule[npc] = schedule_items.HomeFun
-                up_for_fun.add(npc)
-
-        for npc in up_for_fun:
-            # write the friends in random order
-            some_friends = list(world.friendships.friends(npc))
-            random.shuffle(some_friends)
-
-            for possible_engagement in some_friends:
-                if possible_engagement in up_for_fun:
-                    date = possible_engagement
-                    # it's a date!
-                    break
+            # emergencies
+            if npc in very_sleepy:
+                next_items[npc] = schedule_items.HomeSleep
+
+            # otherwise, try to go to work
+            elif npc in shifts_now:
+                go_to = random.choice(shifts_now[npc])
+                next_items[npc] = schedule_items.GoToWork(go_to.enterprise)
+
+            # otherwise, find something to do
+            elif npc in can_sleep:
+                next_items[npc] = schedule_items.HomeSleep
             else:
-                # no one to do stuff with
-                # TODO: In the future, solo activities outside the house with randoms
-                break
+                next_items[npc] = schedule_items.HomeFun
+                up_for_fun[npc] = None
+
+        # pair up friends who are both free, each NPC in at most one pair.
+        # (anyone left over has no one to do stuff with)
+        # NOTE: This is the only group activity right now
+        # TODO: In the future, solo activities outside the house with randoms
+        for npc, date in _pair_up(world, list(up_for_fun)):
+            # it's a date!
+            next_items[npc] = schedule_items.SleepOver(date)
+            # it doesn't make sense for the sleepover guy to be asleep for his own party
+            next_items[date] = schedule_items.HostSleepOver
+
+        next_schedule = Schedule.new(next_items)
+        self._prev_schedule, self._next_schedule = self._next_schedule, next_schedule
 
-            # NOTE: This is the only group activity right now
-            next_schedule[npc] = schedule_items.SleepOver(date)
-            next_schedule[
-                date
-            ] = (
-                schedule_items.HostSleepOver
-            )  # it doesn't make sense for the sleepover guy to be asleep for his own party
 
-        self._prev_schedule, self._next_schedule = self._next_schedule, next_schedule
+def _pair_up(
+    world: "World", free: List[NPCHandle]
+) -> List[Tuple[NPCHandle, NPCHandle]]:
+    # A maximal matching over the friendships between free NPCs, as (guest,
+    # host) pairs. Whoever has the fewest free friends left goes first, and
+    # picks whichever of those has the fewest themselves, so people with only
+    # one option get it before someone else takes it. Ties go by a shuffle
+    order = list(free)
+    random.shuffle(order)
+    rank = {npc: i for i, npc in enumerate(order)}
+
+    free_friends: Dict[NPCHandle, Set[NPCHandle]] = {
+        npc: {friend for friend in world.friendships.friends(npc) if friend in rank}
+        for npc in order
+    }
+
+    # (n free friends, rank, npc). stale entries are skipped when they come up
+    queue = [(len(free_friends[npc]), rank[npc], npc) for npc in order]
+    heapq.heapify(queue)
+
+    pairs = []
+    while queue:
+        n_free, _, npc = heapq.heappop(queue)
+        if npc not in free_friends or n_free != len(free_friends[npc]):
+            continue
+
+        if n_free == 0:
+            del free_friends[npc]
+            continue
+
+        date = min(free_friends[npc], key=lambda f: (len(free_friends[f]), rank[f]))
+        pairs.append((npc, date))
+
+        for taken in (npc, date):
+            for friend in free_friends.pop(taken):
+                if friend in free_friends:
+                    free_friends[friend].discard(taken)
+                    heapq.heappush(
+                        queue, (len(free_friends[friend]), rank[friend], friend)
+                    )
+
+    return pairs
 
 
 from typing import TYPE_CHECKING
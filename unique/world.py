@@ -6,7 +6,7 @@ from ds.vecs import V2
 
 from .biology import Rhythms
 from .challenges import Challenges
-from .event import Event, Verbs
+from .event import Event, EventBus, Verbs
 from .eventmonitor import EventMonitor, EventMonitors
 from .interest import InterestTracker
 from .inventory import Inventory
@@ -25,6 +25,8 @@ N_HOUSEHOLD_NPCS = (1, 5)
 
 class World(object):
     def __init__(self):
+        self.bus = EventBus()
+
         self.challenges = Challenges()
         self.clock = Clock()
         self.enterprises = Enterprises()
@@ -32,9 +34,10 @@ class World(object):
         self.friendships = Friendships()
         self.households = Households()
         self.interest = InterestTracker()
+        # (generates levels on a process pool, from the first one loaded: see Levels)
         self.levels = Levels()
         self.notifications = Notifications()
-        self.npcs = NPCs()
+        self.npcs = NPCs(self.bus)
         self.player = Player()
         self.rhythms = Rhythms()
         self.scene_flags = SceneFlags()
@@ -46,15 +49,19 @@ class World(object):
 
         self.level: Optional[LoadedLevel] = None
 
-        self._notifying = False
-        self._notify_queue = []
+        # in the same order they used to be notified in: event monitors, then
+        # NPCs (including each NPC hearing about its own flags, whenever it
+        # gets generated), then rhythms
+        self.bus.subscribe(Verbs.ALL, self.eventmonitors.notify)
+        self.bus.subscribe([Verbs.Tick], self.npcs.notify)
+        self.npcs.notify_subjects_at(self.bus.reserve_order())
+        self.bus.subscribe([Verbs.AddFlag], self.rhythms.notify)
 
     @classmethod
-    def generate(cls):
-        from .bigprocs.worldgen import main
+    def generate(cls, params: Optional["WorldgenParams"] = None):
+        from .bigprocs.worldgen import WorldgenParams, generate
 
-        world = cls()
-        main(world)
+        world, report = generate(params or WorldgenParams(), cls)
         return world
 
     def advance_time(self):
@@ -89,13 +96,10 @@ class World(object):
     def activate_level(self, level: LevelHandle):
         # figure out who will be there
         # for now, the whole household. in the future use the schedule info
-        spawns = []
-        for npch in self.npcs.all():
-            # TODO: Move this to schedules object
-            if self.schedules.next_location(self, npch) == level:
-                spawns.append(
-                    SpawnNPC(npc=npch, schedule=self.schedules.next_schedule(npch))
-                )
+        spawns = [
+            SpawnNPC(npc=npch, schedule=self.schedules.next_schedule(npch))
+            for npch in self.schedules.npcs_at(self, level)
+        ]
 
         lvl = self.levels.get(level)
         self._activate_level(level, lvl, spawns)
@@ -118,21 +122,10 @@ class World(object):
         return self.notify(Event.new(Verbs.Tick, ()))
 
     def notify(self, event: Event):
-        self._notify_queue.append(event)
-        if self._notifying:
-            return
+        self.bus.publish(self, event)
+
+
+from typing import TYPE_CHECKING
 
-        self._notifying = True
-        try:
-            while any(self._notify_queue):
-                event = self._notify_queue.pop(0)
-                if Verbs.quest_only(event.verb):
-                    # No need for NPCs to know. This event pertains to quests
-                    self.eventmonitors.notify(self, event)
-                else:
-                    self.eventmonitors.notify(self, event)
-                    self.npcs.notify(self, event)
-                    self.rhythms.notify(self, event)
-                    self.scene_flags.notify(self, event)
-        finally:
-            self._notifying = False
+if TYPE_CHECKING:
+    from .bigprocs.worldgen import WorldgenParams
@@ -1,5 +1,7 @@
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
 from enum import Enum
-from typing import Dict, NamedTuple
+from typing import Dict, NamedTuple, Optional
 
 from ds.gensym import Gensym, Sym
 
@@ -22,6 +24,27 @@ class Zoning(NamedTuple):
     demand: Demand
 
 
+_pool: Optional[Executor] = None
+
+
+def _shared_pool() -> Optional[Executor]:
+    # one pool of level generating processes for every Realtor. spawn, not
+    # fork: forking a process that has SDL running in it isn't safe
+    # NOTE: spawn runs the main script again in each worker, so scripts that
+    #  load levels need an `if __name__ == "__main__":` guard. without one,
+    #  the workers die, and Realtor goes back to building levels itself.
+    #  (the pool only starts when the first level is generated, so just
+    #  making a World doesn't need one)
+    global _pool
+    if _pool is None:
+        try:
+            _pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+        except (NotImplementedError, OSError):
+            # no working multiprocessing here: Realtor falls back to serial
+            return None
+    return _pool
+
+
 class Levels(object):
     def __init__(self):
         self._zoning: Dict[LevelHandle, Zoning] = {}
@@ -29,8 +52,8 @@ class Levels(object):
         self._sym = Gensym("LVL")
 
         self._realtors: Dict[ZoneType, Realtor] = {
-            ZoneType.Residence: Realtor(residence),
-            ZoneType.Restaurant: Realtor(restaurant),
+            ZoneType.Residence: Realtor(residence, _shared_pool),
+            ZoneType.Restaurant: Realtor(restaurant, _shared_pool),
         }
 
     def get(self, level: LevelHandle) -> UnloadedLevel:
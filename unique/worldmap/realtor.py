@@ -1,4 +1,8 @@
-from typing import Callable, List, NamedTuple
+import random
+from collections import deque
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Deque, NamedTuple, Optional
 
 from ..level import UnloadedLevel, Veto
 
@@ -7,6 +11,12 @@ MAX_TIMES_UNSOLD = 5
 
 TRIES_PER_PROPERTY = 5
 
+# start generating more properties once we're down to this many
+RESTOCK_WATERMARK = N_PROPERTIES // 2
+
+# give up if this many jobs in a row fail to produce anything
+MAX_FAILED_LISTINGS = N_PROPERTIES
+
 
 class Property(NamedTuple):
     level: UnloadedLevel
@@ -21,55 +31,147 @@ class Demand(NamedTuple):
         return 0.0
 
 
+class _Listing(NamedTuple):
+    # a property that may still be under construction. (future is None if no
+    # one has started building it yet)
+    future: "Optional[Future[Optional[UnloadedLevel]]]"
+    seed: int
+    times_unsold: int
+
+
+def _build(
+    level_generator: Callable[[], UnloadedLevel], seed: int
+) -> Optional[UnloadedLevel]:
+    # usually runs in a worker process. the RNG state comes from seed, and is
+    # put back after, so building in-process gives the same level
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        for t in range(TRIES_PER_PROPERTY):
+            try:
+                return level_generator()
+            except Veto as v:
+                continue
+        return None
+    finally:
+        random.setstate(state)
+
+
+class _InlineExecutor(Executor):
+    # for when there is no pool: do the work right away, on this thread
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
 class Realtor(object):
-    def __init__(self, level_generator: Callable[[], UnloadedLevel]):
-        self._properties: List[Property] = []
+    def __init__(
+        self,
+        level_generator: Callable[[], UnloadedLevel],
+        get_executor: Optional[Callable[[], Optional[Executor]]] = None,
+    ):
+        # level_generator needs to be picklable (ex: a module-level function)
+        # if the executor hands work to other processes.
+        # get_executor is only called on the first gen(), so that nothing
+        # (ex: a process pool) starts up for a Realtor no one buys from
+        self._listings: Deque[_Listing] = deque()
         self._level_generator: Callable[[], UnloadedLevel] = level_generator
+        self._get_executor = get_executor
+        self._executor: Optional[Executor] = None
+        self._failed_listings = 0
+
+        # draw the first seeds now, so they don't depend on when the first
+        # gen() happens. building them waits for that gen()
+        self._restock()
 
     def gen(self, demand: Demand) -> UnloadedLevel:
+        if self._executor is None:
+            self._open()
         self._restock()
 
-        best_property_ix = max(
-            range(len(self._properties)),
-            key=lambda i: demand.score(self._properties[i]),
-        )
-        property = self._properties.pop(best_property_ix)
+        # properties go out in the order they were listed, waiting on the
+        # oldest if it isn't built yet. that way the level a seed gets doesn't
+        # depend on which worker finished first
+        # TODO: Choose by demand.score() once Demand means something. (That
+        #  means waiting on every listing, to stay deterministic)
+        while True:
+            listing = self._listings.popleft()
+            level = self._result(listing)
+            if level is not None:
+                break
 
-        for i in range(len(self._properties)):
-            self._properties[i] = self._properties[i]._replace(
-                times_unsold=self._properties[i].times_unsold + 1
-            )
+            # every try got vetoed: list something else in its place
+            self._failed_listings += 1
+            if self._failed_listings > MAX_FAILED_LISTINGS:
+                raise AssertionError(
+                    "couldn't generate a property in {} tries".format(
+                        self._failed_listings * TRIES_PER_PROPERTY
+                    )
+                )
+            self._listings.appendleft(self._list(listing.times_unsold))
+        self._failed_listings = 0
+
+        self._listings = deque(
+            l._replace(times_unsold=l.times_unsold + 1) for l in self._listings
+        )
 
-        return property.level
+        self._restock()
+        return level
+
+    def _result(self, listing: _Listing) -> Optional[UnloadedLevel]:
+        try:
+            return listing.future.result()
+        except BrokenProcessPool:
+            # the workers died. (ex: a script that made a World without an
+            # `if __name__ == "__main__":` guard.) build it here instead: same
+            # seed, same level
+            self._executor = _InlineExecutor()
+            return _build(self._level_generator, listing.seed)
+
+    def _list(self, times_unsold: int) -> _Listing:
+        # seeds come from the main RNG, so the result only depends on the order
+        # things were listed in, not on which worker got there first
+        listing = _Listing(
+            future=None, seed=random.getrandbits(64), times_unsold=times_unsold
+        )
+        if self._executor is None:
+            return listing
+        return self._submit(listing)
+
+    def _submit(self, listing: _Listing) -> _Listing:
+        try:
+            future = self._executor.submit(_build, self._level_generator, listing.seed)
+        except BrokenProcessPool:
+            self._executor = _InlineExecutor()
+            future = self._executor.submit(_build, self._level_generator, listing.seed)
+        return listing._replace(future=future)
+
+    def _open(self):
+        # start building everything listed so far
+        executor = self._get_executor() if self._get_executor else None
+        self._executor = executor or _InlineExecutor()
+        self._listings = deque(self._submit(l) for l in self._listings)
 
     def _restock(self):
-        for i in range(len(self._properties))[::-1]:
-            if self._properties[i].times_unsold > MAX_TIMES_UNSOLD:
-                self._properties.pop(i)
+        for l in self._listings:
+            if l.times_unsold > MAX_TIMES_UNSOLD:
+                l.future.cancel()  # (no one's going to buy it: stop building it)
+        self._listings = deque(
+            l for l in self._listings if l.times_unsold <= MAX_TIMES_UNSOLD
+        )
+
+        if len(self._listings) > RESTOCK_WATERMARK:
+            return
 
         tallies_to_add = []
         for tally in range(MAX_TIMES_UNSOLD):
             for xi in range(N_PROPERTIES // MAX_TIMES_UNSOLD):
                 tallies_to_add.append(tally)
 
-        properties_needed = N_PROPERTIES - len(self._properties)
-        tallies_to_add = tallies_to_add[:properties_needed]
-
-        max_tries = properties_needed * TRIES_PER_PROPERTY
-        for t in range(max_tries):
-            if len(self._properties) >= N_PROPERTIES:
-                break
-
-            try:
-                level = self._level_generator()
-                tally = tallies_to_add.pop(0)
-                self._properties.append(Property(level=level, times_unsold=tally))
-            except Veto as v:
-                continue
-
-        else:
-            raise AssertionError(
-                "couldn't generate {} properties in {} tries".format(
-                    properties_needed, max_tries
-                )
-            )
+        properties_needed = N_PROPERTIES - len(self._listings)
+        for tally in tallies_to_add[:properties_needed]:
+            self._listings.append(self._list(tally))